@@ -3,57 +3,435 @@ import mimetypes
 mimetypes.MimeTypes.read_windows_registry = lambda self, strict=True: None
 
 import os
+import re
+import time
+import asyncio
+from contextlib import contextmanager
+import httpx
+import groq
 from dotenv import load_dotenv
-from groq import Groq
+from groq import Groq, AsyncGroq, DefaultAsyncHttpxClient
+from cassette import CassetteMiss
+from scheduler import RequestScheduler
+from tokens import count_tokens
+from usage import PROCESS_USAGE, UsageTracker, build_record, chunk_usage
 load_dotenv()
 
-class ModelConnector:
-    def __init__(self):
-        # Initialize Groq
+DEFAULT_MODEL = "openai/gpt-oss-20b"
+# Completion size assumed when reserving tokens-per-minute budget, unless
+# sampling_params sets max_tokens / max_completion_tokens
+DEFAULT_COMPLETION_ESTIMATE = 1024
+
+
+class ModelConnectorError(Exception):
+    """Raised when a model call fails"""
+    pass
+
+class RateLimitError(ModelConnectorError):
+    """Raised when the provider is still rate limiting us after all retries"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        # Seconds the provider asked us to wait, if it said
+        self.retry_after = retry_after
+
+class ModelUnavailableError(ModelConnectorError):
+    """Raised on connection errors, timeouts and 5xx responses"""
+    pass
+
+# Errors the scheduler retries with backoff
+RETRYABLE_ERRORS = (RateLimitError, ModelUnavailableError)
+
+
+def _parse_duration(value):
+    """Parse "7.66s", "2m59.56s" or "120ms" style durations into seconds"""
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    return sum(float(n) * units[u] for n, u in parts)
+
+
+def _retry_after(response):
+    """Seconds to wait according to a rate-limited response's headers, or None"""
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("retry-after"):
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            pass
+    resets = [
+        _parse_duration(headers.get(name, ""))
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+    ]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+def _translate_error(exc):
+    """Map a Groq SDK exception onto our typed errors"""
+    if isinstance(exc, groq.RateLimitError):
+        return RateLimitError(f"Groq rate limit: {exc}", retry_after=_retry_after(exc.response))
+    if isinstance(exc, (groq.APIConnectionError, groq.InternalServerError)):
+        return ModelUnavailableError(f"Groq unavailable: {exc}")
+    return ModelConnectorError(f"Groq API Error: {exc}")
+
+def _build_messages(prompt, history=None):
+    """Chat message list: the earlier turns, then the new user prompt"""
+    return [
+        {"role": m["role"], "content": m["content"]} for m in (history or [])
+    ] + [
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _messages_text(messages):
+    return "\n".join(m["content"] for m in messages)
+
+
+@contextmanager
+def _model_errors():
+    """Re-raise SDK (and cassette) failures as our typed errors"""
+    try:
+        yield
+    except groq.APIError as e:
+        raise _translate_error(e) from e
+    except CassetteMiss as e:
+        raise ModelConnectorError(str(e)) from e
+
+
+class _Call:
+    """One model request, from the cache lookup to the usage record"""
+
+    def __init__(self, model, messages, purpose, cache_key):
+        self.model = model
+        self.messages = messages
+        self.purpose = purpose
+        self.cache_key = cache_key
+        self.started = time.perf_counter()
+        # Tokens reserved with the scheduler before sending
+        self.estimated = 0
+
+
+class _ConnectorBase:
+    """
+    Everything ModelConnector and AsyncModelConnector share: building the
+    request, the response cache, the scheduler's token budget and usage
+    records. Subclasses only make the actual call to the provider.
+    """
+
+    def __init__(self, cache=None, sampling_params=None, scheduler=None):
+        # Retries are handled by the scheduler, not by the Groq SDK
+        self.scheduler = scheduler or RequestScheduler()
         self.groq_api_key = os.getenv("GROQ_API_KEY")
-        if self.groq_api_key:
-            self.groq_client = Groq(api_key=self.groq_api_key)
+        self.groq_client = None
+        self.cache = cache
+        self.sampling_params = dict(sampling_params or {})
+        # Token usage of every call made through this connector (one session)
+        self.usage = UsageTracker()
+
+    def _cache_key(self, model, messages, use_cache):
+        # None means "don't read or write the cache for this call"
+        if self.cache is None or not use_cache:
+            return None
+        return self.cache.make_key(model, messages, self.sampling_params)
+
+    def _estimate_tokens(self, messages):
+        # Only worth tokenizing when there is a tokens-per-minute budget to charge
+        if not self.scheduler.token_bucket:
+            return 0
+        completion = (
+            self.sampling_params.get("max_completion_tokens")
+            or self.sampling_params.get("max_tokens")
+            or DEFAULT_COMPLETION_ESTIMATE
+        )
+        # What the scheduler will really take, which is also what _settle corrects
+        return self.scheduler.reservation(count_tokens(_messages_text(messages)) + completion)
+
+    def _settle(self, estimated, api_usage):
+        # Hand back (or take) the difference between reserved and real tokens
+        actual = getattr(api_usage, "total_tokens", None) if api_usage is not None else None
+        self.scheduler.settle(estimated, actual)
+
+    def _record_usage(self, *args, **kwargs):
+        # Same record goes to this session's tracker and the process-wide one
+        record = build_record(*args, **kwargs)
+        self.usage.record(record)
+        PROCESS_USAGE.record(record)
+
+    def usage_summary(self):
+        """
+        Token usage of this connector so far.
+
+        Returns:
+            dict with "totals", "by_purpose" and "by_model"
+        """
+        return {
+            "totals": self.usage.totals(),
+            "by_purpose": self.usage.by_purpose(),
+            "by_model": self.usage.by_model(),
+        }
+
+    def _begin(self, prompt, model, use_cache, purpose, history):
+        messages = _build_messages(prompt, history)
+        return _Call(model, messages, purpose, self._cache_key(model, messages, use_cache))
+
+    def _cached(self, call):
+        """Cached response for the call (recorded as a cached call), or None"""
+        if not call.cache_key:
+            return None
+        cached = self.cache.get(call.cache_key)
+        if cached is not None:
+            self._record_usage(call.model, _messages_text(call.messages), cached, None,
+                               call.started, call.purpose, cached=True)
+        return cached
+
+    def _request(self, call, **extra):
+        """Arguments for chat.completions.create; also sizes the token reservation"""
+        if not self.groq_client:
+            raise ModelConnectorError("Groq client not initialized. Is GROQ_API_KEY set?")
+        call.estimated = self._estimate_tokens(call.messages)
+        return dict(messages=call.messages, model=call.model, **extra, **self.sampling_params)
+
+    def _finish(self, call, content, api_usage):
+        self._settle(call.estimated, api_usage)
+        self._record_usage(call.model, _messages_text(call.messages), content, api_usage,
+                           call.started, call.purpose)
+        if call.cache_key:
+            self.cache.put(call.cache_key, content)
+
+
+class ModelConnector(_ConnectorBase):
+    def __init__(self, cache=None, sampling_params=None, scheduler=None, cassette=None):
+        """
+        Args:
+            cache: Optional ResponseCache; identical requests are then answered from disk.
+            sampling_params (dict): Extra arguments for chat.completions.create
+                                    (temperature, top_p, ...). Part of the cache key.
+            scheduler: Optional RequestScheduler with rate limits; by default
+                       calls are only retried, not throttled.
+            cassette: Optional Cassette. In record mode every Groq call is
+                      saved to it; in replay mode calls are answered from it
+                      and no API key is needed. The response cache is
+                      bypassed either way, so every call reaches the cassette.
+        """
+        super().__init__(None if cassette is not None else cache, sampling_params, scheduler)
+
+        # Initialize Groq
+        self.cassette = cassette
+        if cassette is not None and cassette.mode == "replay":
+            self.groq_client = cassette.client()
+        elif self.groq_api_key:
+            self.groq_client = Groq(api_key=self.groq_api_key, max_retries=0)
+            if cassette is not None:
+                self.groq_client = cassette.client(self.groq_client)
         else:
             print("Warning: GROQ_API_KEY not found.")
-            self.groq_client = None
 
 
     # Using Groq to send message
-    def send_message(self, message, history=None):
+    def send_message(self, message, history=None, use_cache=True, purpose=None):
         """
         Adapter method to match the interface expected by optimizer.py
-        Expects: message (str)
+        Expects: message (str), history (list of {"role", "content"} dicts, optional)
         Returns: dict {"content": str}
+        Raises: ModelConnectorError (or a subclass) if the call fails
+        Pass use_cache=False to skip the response cache and sample fresh.
+        purpose labels the call in the usage records ("clarify", "optimize").
         """
         # We use Groq as the default engine for the optimizer
         # because it is fast and smart.
-        response_text = self.chat_with_groq(message)
+        response_text = self.chat_with_groq(message, use_cache=use_cache, purpose=purpose, history=history)
         
         # Optimizer expects a dictionary, not just a string
         return {"content": response_text}
 
-        
-    def chat_with_groq(self, prompt, model="openai/gpt-oss-20b"):
+    def stream_message(self, message, history=None, use_cache=True, purpose=None):
+        """
+        Streaming variant of send_message.
+        Expects: message (str)
+        Yields: str chunks of the response as they arrive
+        """
+        yield from self.stream_with_groq(message, use_cache=use_cache, purpose=purpose, history=history)
+
+    def chat_with_groq(self, prompt, model=DEFAULT_MODEL, use_cache=True, purpose=None, history=None):
         """
         Call Groq API (Running Llama 3).
         
         Args:
             prompt (str): User input.
             model (str): ""llama-3.3-70b-versatile"
+            use_cache (bool): Look the request up in the response cache first.
+            purpose (str): Label for the usage records.
+            history (list): Earlier {"role", "content"} messages sent before the prompt.
+
+        Raises:
+            RateLimitError: still rate limited after the scheduler's retries
+            ModelUnavailableError: network/5xx failures after retries
+            ModelConnectorError: any other failure
         """
-        if not self.groq_client:
-            return "Error: Groq client not initialized."
+        call = self._begin(prompt, model, use_cache, purpose, history)
+        cached = self._cached(call)
+        if cached is not None:
+            return cached
+        request = self._request(call)
 
-        try:
-            response = self.groq_client.chat.completions.create(
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                model=model,
+        def send():
+            with _model_errors():
+                return self.groq_client.chat.completions.create(**request)
+
+        response = self.scheduler.run(send, call.estimated, RETRYABLE_ERRORS)
+        content = response.choices[0].message.content
+        self._finish(call, content, getattr(response, "usage", None))
+        return content
+
+    def stream_with_groq(self, prompt, model=DEFAULT_MODEL, use_cache=True, purpose=None, history=None):
+        """
+        Call Groq API with stream=True and yield text deltas.
+
+        Args:
+            prompt (str): User input.
+            model (str): Groq model name.
+            use_cache (bool): Serve a cached response in one chunk if there is one.
+            purpose (str): Label for the usage records.
+            history (list): Earlier {"role", "content"} messages sent before the prompt.
+
+        Raises:
+            ModelConnectorError (or a subclass), like chat_with_groq. Failures
+            before the first chunk are retried; failures mid-stream are not.
+        """
+        call = self._begin(prompt, model, use_cache, purpose, history)
+        cached = self._cached(call)
+        if cached is not None:
+            yield cached
+            return
+        request = self._request(call, stream=True)
+
+        def send():
+            with _model_errors():
+                return self.groq_client.chat.completions.create(**request)
+
+        stream = self.scheduler.run(send, call.estimated, RETRYABLE_ERRORS)
+
+        chunks = []
+        api_usage = None
+        with _model_errors():
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    chunks.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+                api_usage = chunk_usage(chunk, api_usage)
+
+        self._finish(call, "".join(chunks), api_usage)
+
+
+class AsyncModelConnector(_ConnectorBase):
+    """
+    asyncio version of ModelConnector for bulk work.
+
+    All calls share one AsyncGroq client, and therefore one pooled
+    httpx connection pool, so concurrent requests reuse open connections
+    instead of paying a new TLS handshake each time.
+    """
+
+    def __init__(self, max_connections=20, max_keepalive_connections=10,
+                 cache=None, sampling_params=None, scheduler=None):
+        """
+        Args:
+            max_connections (int): Upper bound on open connections in the pool.
+            max_keepalive_connections (int): Idle connections kept alive for reuse.
+            cache: Optional ResponseCache, shared with ModelConnector if you like.
+            sampling_params (dict): Extra arguments for chat.completions.create.
+            scheduler: Optional RequestScheduler with rate limits.
+        """
+        super().__init__(cache, sampling_params, scheduler)
+        self.http_client = None
+        if self.groq_api_key:
+            self.http_client = DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                )
             )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Groq API Error: {str(e)}"
+            self.groq_client = AsyncGroq(
+                api_key=self.groq_api_key,
+                http_client=self.http_client,
+                max_retries=0,
+            )
+        else:
+            print("Warning: GROQ_API_KEY not found.")
+
+    async def send_message(self, message, history=None, use_cache=True, purpose=None):
+        """
+        Coroutine counterpart of ModelConnector.send_message.
+        Expects: message (str)
+        Returns: dict {"content": str}
+        """
+        response_text = await self.chat_with_groq(message, use_cache=use_cache, purpose=purpose, history=history)
+        return {"content": response_text}
+
+    async def send_many(self, messages, concurrency=8, use_cache=True, purpose=None):
+        """
+        Send several messages at once, with at most `concurrency` in flight.
+
+        A failing message doesn't stop the others: its slot in the result
+        holds the exception instead, so one bad draft never costs the
+        responses already received.
+
+        Args:
+            messages (list[str]): Messages to send.
+            concurrency (int): Maximum number of simultaneous requests.
+            use_cache (bool): Passed to send_message for every message.
+            purpose (str): Label for the usage records.
+
+        Returns:
+            list: One {"content": str} or ModelConnectorError (or other
+                  exception) per message, in input order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(message):
+            async with semaphore:
+                return await self.send_message(message, use_cache=use_cache, purpose=purpose)
+
+        return await asyncio.gather(*(bounded(m) for m in messages), return_exceptions=True)
+
+    async def chat_with_groq(self, prompt, model=DEFAULT_MODEL, use_cache=True, purpose=None, history=None):
+        """
+        Call Groq API without blocking the event loop.
+
+        Args:
+            prompt (str): User input.
+            model (str): Groq model name.
+            use_cache (bool): Look the request up in the response cache first.
+            purpose (str): Label for the usage records.
+            history (list): Earlier {"role", "content"} messages sent before the prompt.
+        """
+        call = self._begin(prompt, model, use_cache, purpose, history)
+        cached = self._cached(call)
+        if cached is not None:
+            return cached
+        request = self._request(call)
+
+        async def send():
+            with _model_errors():
+                return await self.groq_client.chat.completions.create(**request)
+
+        response = await self.scheduler.arun(send, call.estimated, RETRYABLE_ERRORS)
+        content = response.choices[0].message.content
+        self._finish(call, content, getattr(response, "usage", None))
+        return content
+
+    async def aclose(self):
+        """Close the pooled connections."""
+        if self.groq_client:
+            await self.groq_client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
 
 if __name__ == "__main__":
     connector = ModelConnector()
@@ -0,0 +1,222 @@
+"""
+Headless batch mode for PromptPrompt.
+
+Reads draft prompts from a JSONL file, runs each one through
+PromptOptimizer.clarify and generate_optimized_prompt on a bounded pool of
+worker threads, and appends one JSON result per line to an output file as
+soon as that draft finishes. Drafts already present in the output with
+status "ok" are skipped, so an interrupted run can simply be restarted.
+
+Input lines look like:
+    {"id": "welcome-email", "draft": "write a welcome email", "answers": ["new users", "friendly"]}
+
+"prompt" is accepted instead of "draft", and records shaped like
+requests.jsonl ({"request_id", "title", "body"}) work as-is.
+
+Usage:
+    python batch.py drafts.jsonl results.jsonl --workers 8
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from api_client import ModelConnector
+from cassette import add_cassette_args, open_cassette
+from response_cache import ResponseCache
+from scheduler import RequestScheduler
+from usage import PROCESS_USAGE
+from optimizer import PromptOptimizer
+
+# Used for every clarifying question that has no pre-supplied answer
+DEFAULT_ANSWER = "No specific preference - use your best judgement."
+
+
+def load_drafts(input_path):
+    """
+    Read draft records from a JSONL file.
+
+    Args:
+        input_path: Path to the input JSONL file.
+
+    Returns:
+        List of dicts with keys "id", "draft" and "answers".
+    """
+    drafts = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+
+            draft_id = record.get("id") or record.get("request_id") or f"line-{line_no}"
+            draft = record.get("draft") or record.get("prompt")
+            if not draft:
+                # requests.jsonl style: title + body
+                draft = "\n\n".join(
+                    part for part in (record.get("title"), record.get("body")) if part
+                )
+
+            answers = record.get("answers") or []
+            if isinstance(answers, str):
+                answers = [answers]
+
+            drafts.append({"id": str(draft_id), "draft": draft, "answers": answers})
+    return drafts
+
+
+def load_checkpoint(output_path):
+    """
+    Collect the ids that already finished successfully in a previous run.
+
+    Args:
+        output_path: Path to the output JSONL file.
+
+    Returns:
+        Set of completed draft ids.
+    """
+    done = set()
+    output_path = Path(output_path)
+    if not output_path.exists():
+        return done
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A half-written last line from a crash; it will be redone
+                continue
+            if result.get("status") == "ok":
+                done.add(str(result.get("id")))
+    return done
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, 2)
+        return f.read(1) == b"\n"
+
+
+def optimize_one(api_client, item):
+    """
+    Run the full clarify -> optimize flow for a single draft.
+
+    Each draft gets its own PromptOptimizer so conversation history is never
+    shared between drafts; the API client (and its connection pool) is shared.
+
+    Args:
+        api_client: Connector passed through to PromptOptimizer.
+        item: Draft record from load_drafts.
+
+    Returns:
+        Result dict ready to be written to the output file.
+    """
+    start = time.perf_counter()
+    result = {"id": item["id"], "draft": item["draft"]}
+    try:
+        optimizer = PromptOptimizer(api_client=api_client)
+        questions = optimizer.clarify(item["draft"])
+        answers = list(item["answers"][:len(questions)])
+        answers += [DEFAULT_ANSWER] * (len(questions) - len(answers))
+        optimized = optimizer.generate_optimized_prompt(item["draft"], questions, answers)
+
+        result.update({
+            "questions": questions,
+            "answers": answers,
+            "optimized": optimized,
+            "practices": optimizer.last_practices_report,
+            "status": "ok",
+        })
+    except Exception as e:
+        result.update({"status": "error", "error": str(e)})
+
+    result["elapsed"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(input_path, output_path, workers=8, api_client=None, use_cache=True,
+              requests_per_minute=None, tokens_per_minute=None, cassette=None):
+    """
+    Optimize every pending draft in input_path, streaming results to output_path.
+
+    Args:
+        input_path: JSONL file of drafts.
+        output_path: JSONL file results are appended to (also the checkpoint).
+        workers: Maximum number of drafts processed at the same time.
+        api_client: Optional connector; a ModelConnector is created if omitted.
+        use_cache: Give the created ModelConnector a ResponseCache, so drafts
+                   retried after a crash don't pay for the same calls twice.
+        requests_per_minute: Request rate limit for the created ModelConnector.
+        tokens_per_minute: Token rate limit for the created ModelConnector.
+        cassette: Optional Cassette for the created ModelConnector to record
+                  to or replay from.
+
+    Returns:
+        dict with "ok", "error" and "skipped" counts.
+    """
+    drafts = load_drafts(input_path)
+    done = load_checkpoint(output_path)
+    pending = [item for item in drafts if item["id"] not in done]
+
+    counts = {"ok": 0, "error": 0, "skipped": len(drafts) - len(pending)}
+    print(f"[Batch] {len(pending)} drafts to optimize, {counts['skipped']} already done.")
+    if not pending:
+        return counts
+
+    if api_client is None:
+        api_client = ModelConnector(
+            cache=ResponseCache() if use_cache else None,
+            scheduler=RequestScheduler(requests_per_minute, tokens_per_minute),
+            cassette=cassette,
+        )
+
+    # Results are written from this thread only, as each future completes
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        if out.tell() > 0 and not _ends_with_newline(output_path):
+            # Don't glue the first new result onto a truncated line
+            out.write("\n")
+
+        futures = [pool.submit(optimize_one, api_client, item) for item in pending]
+
+        for future in as_completed(futures):
+            result = future.result()
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+
+            counts[result["status"]] += 1
+            finished = counts["ok"] + counts["error"]
+            print(f"[Batch] {finished}/{len(pending)} {result['id']}: {result['status']}")
+
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optimize draft prompts from a JSONL file.")
+    parser.add_argument("input", help="JSONL file of draft prompts")
+    parser.add_argument("output", help="JSONL file to append results to (resumable)")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent drafts (default: 8)")
+    parser.add_argument("--no-cache", action="store_true", help="always call the API, ignoring cached responses")
+    parser.add_argument("--rpm", type=float, help="provider limit: requests per minute")
+    parser.add_argument("--tpm", type=float, help="provider limit: tokens per minute")
+    add_cassette_args(parser)
+    args = parser.parse_args(argv)
+
+    counts = run_batch(args.input, args.output, workers=args.workers, use_cache=not args.no_cache,
+                       requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                       cassette=open_cassette(args))
+    print(f"[Batch] Done. ok={counts['ok']} error={counts['error']} skipped={counts['skipped']}")
+    if PROCESS_USAGE.records:
+        print("[Batch] Token usage:")
+        for line in PROCESS_USAGE.summary().splitlines():
+            print(f"[Batch]   {line}")
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
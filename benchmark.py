@@ -0,0 +1,453 @@
+"""
+End-to-end benchmark of PromptPrompt's own overhead.
+
+Drives PromptOptimizer.clarify, generate_optimized_prompt (plain and
+streamed), refine_optimized_prompt and Storage.save_prompts through the real
+ModelConnector, with the Groq client swapped for a deterministic local fake.
+The fake's latency and response size are configurable, and the time it
+spends sleeping is subtracted per stage, so regressions in our code show up
+separately from provider latency. Real traffic can be used instead: record a
+cassette once with --record (needs GROQ_API_KEY), then benchmark offline
+against it with --replay.
+
+Reports, per stage, p50/p95/p99 latency and memory allocated (tracemalloc,
+measured in a separate pass because tracing slows everything down), plus
+the throughput of concurrent runs through batch.py and
+AsyncModelConnector.send_many, measured by wall clock, as JSON so results
+from two commits can be diffed.
+
+Usage:
+    python benchmark.py --iterations 200 --latency 0.05 --response-tokens 400
+    python benchmark.py --output bench.json
+    python benchmark.py --iterations 5 --warmup 0 --alloc-iterations 0 --record groq.jsonl.gz
+    python benchmark.py --replay groq.jsonl.gz --realtime
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+import batch
+from api_client import AsyncModelConnector, ModelConnector
+from cassette import add_cassette_args, open_cassette
+from optimizer import PromptOptimizer
+from storage import Storage
+
+DRAFTS = [
+    "write a blog post about AI coding tools",
+    "help me plan a two-week trip to Japan in spring",
+    "explain how transformers work to a product manager",
+    "draft a cover letter for a senior data engineer role",
+    "create a study plan for learning Rust in a month",
+]
+ANSWERS = ["Intermediate developers", "Friendly but precise", "About 800 words", "Markdown"]
+REFINEMENT = "Make it shorter and add a section on risks"
+
+_WORDS = (
+    "the prompt should clearly state audience tone format length constraints examples "
+    "context goal success criteria steps output structure role task details avoid include"
+).split()
+
+
+class FakeGroqClient:
+    """
+    Stand-in for groq.Groq: client.chat.completions.create(...) returns
+    deterministic responses after a fixed delay.
+
+    Responses are `response_tokens` words long (one word is about one token)
+    and streamed in chunks of `chunk_tokens` words. The clarify request gets
+    a "TIER: 2" line and numbered questions so the optimizer can parse it.
+    """
+
+    def __init__(self, latency=0.0, response_tokens=300, chunk_tokens=8, seed=0):
+        """
+        Args:
+            latency: Seconds to wait before a response (or its first chunk).
+            response_tokens: Length of every response, in words.
+            chunk_tokens: Words per streamed chunk.
+            seed: Seed for the response text.
+        """
+        self.latency = latency
+        self.response_tokens = response_tokens
+        self.chunk_tokens = chunk_tokens
+        self.seed = seed
+        # Seconds spent in simulated provider latency, per thread
+        self._local = threading.local()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @property
+    def waited(self):
+        return getattr(self._local, "waited", 0.0)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+            self._local.waited = self.waited + self.latency
+
+    def _response_text(self, messages):
+        prompt = messages[-1]["content"]
+        rng = random.Random(f"{self.seed}:{len(prompt)}")
+        words = [rng.choice(_WORDS) for _ in range(self.response_tokens)]
+        if "ASKING CLARIFYING QUESTIONS" in prompt:
+            questions = [f"{i}. {' '.join(words[i * 8:i * 8 + 8])}?" for i in range(1, 4)]
+            return "TIER: 2\n\n" + "\n".join(questions)
+        return " ".join(words)
+
+    def _usage(self, messages, content):
+        prompt_tokens = sum(len(m["content"].split()) for m in messages)
+        completion_tokens = len(content.split())
+        return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                               total_tokens=prompt_tokens + completion_tokens)
+
+    def create(self, messages, model, stream=False, **params):
+        content = self._response_text(messages)
+        usage = self._usage(messages, content)
+        self._wait()
+        if not stream:
+            message = SimpleNamespace(content=content)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+        return self._stream(content, usage)
+
+    def _stream(self, content, usage):
+        words = content.split(" ")
+        for i in range(0, len(words), self.chunk_tokens):
+            text = " ".join(words[i:i + self.chunk_tokens])
+            if i:
+                text = " " + text
+            delta = SimpleNamespace(content=text)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], x_groq=None, usage=None)
+        # Like Groq: the last chunk carries no text, only usage
+        yield SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=usage), usage=None)
+
+
+class AsyncFakeGroqClient(FakeGroqClient):
+    """FakeGroqClient with groq.AsyncGroq's awaitable create()"""
+
+    async def create(self, messages, model, stream=False, **params):
+        content = self._response_text(messages)
+        usage = self._usage(messages, content)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    async def close(self):
+        pass
+
+
+def fake_connector(latency=0.0, response_tokens=300, chunk_tokens=8, seed=0):
+    """A real ModelConnector (no response cache) talking to FakeGroqClient"""
+    connector = ModelConnector(cache=None)
+    connector.groq_client = FakeGroqClient(latency, response_tokens, chunk_tokens, seed)
+    return connector
+
+
+def batch_throughput(drafts=200, workers=8, latency=0.0, response_tokens=300, seed=0):
+    """
+    Drafts per second through batch.run_batch (clarify + optimize on a
+    thread pool), by wall clock.
+
+    Args:
+        drafts: Drafts to optimize.
+        workers: Drafts processed at the same time.
+        latency, response_tokens, seed: Passed to the fake client.
+    """
+    connector = fake_connector(latency, response_tokens, seed=seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = Path(tmp) / "drafts.jsonl"
+        input_path.write_text("".join(
+            json.dumps({"id": str(i), "draft": DRAFTS[i % len(DRAFTS)], "answers": ANSWERS}) + "\n"
+            for i in range(drafts)
+        ), encoding="utf-8")
+        # run_batch reports progress on stdout, which carries our JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            started = time.perf_counter()
+            counts = batch.run_batch(input_path, Path(tmp) / "results.jsonl",
+                                     workers=workers, api_client=connector)
+            elapsed = time.perf_counter() - started
+    return {
+        "drafts": drafts,
+        "workers": workers,
+        "errors": counts["error"],
+        "wall_s": round(elapsed, 4),
+        "drafts_per_s": round(drafts / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def send_many_throughput(requests=200, concurrency=8, latency=0.0, response_tokens=300, seed=0):
+    """
+    Requests per second through AsyncModelConnector.send_many, by wall clock.
+
+    Args:
+        requests: Messages to send.
+        concurrency: Requests in flight at once.
+        latency, response_tokens, seed: Passed to the fake client.
+    """
+    async def run():
+        async with AsyncModelConnector() as connector:
+            connector.groq_client = AsyncFakeGroqClient(latency, response_tokens, seed=seed)
+            messages = [DRAFTS[i % len(DRAFTS)] + f" (#{i})" for i in range(requests)]
+            started = time.perf_counter()
+            results = await connector.send_many(messages, concurrency=concurrency)
+            return time.perf_counter() - started, sum(isinstance(r, Exception) for r in results)
+
+    elapsed, errors = asyncio.run(run())
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_s": round(elapsed, 4),
+        "requests_per_s": round(requests / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def _percentile(sorted_values, q):
+    # Linear interpolation between closest ranks (numpy's default method)
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(samples, overhead):
+    """
+    Latency statistics for one stage. Stages run one after another, so there
+    is no per-stage throughput; see batch_throughput() for that.
+
+    Args:
+        samples: Wall time of every call, seconds.
+        overhead: The same calls minus simulated provider latency.
+    """
+    walls = sorted(samples)
+    own = sorted(overhead)
+    total = sum(walls)
+    stats = {
+        "calls": len(walls),
+        "p50_ms": _percentile(walls, 0.50) * 1000,
+        "p95_ms": _percentile(walls, 0.95) * 1000,
+        "p99_ms": _percentile(walls, 0.99) * 1000,
+        "mean_ms": total / len(walls) * 1000 if walls else 0.0,
+        "overhead_p50_ms": _percentile(own, 0.50) * 1000,
+        "overhead_p95_ms": _percentile(own, 0.95) * 1000,
+        "overhead_p99_ms": _percentile(own, 0.99) * 1000,
+    }
+    return {key: round(value, 4) for key, value in stats.items()}
+
+
+class Session:
+    """One clarify -> generate -> refine -> save run, stage by stage"""
+
+    STAGES = ["clarify", "generate", "generate_stream", "refine", "save"]
+
+    def __init__(self, connector, storage, draft):
+        self.connector = connector
+        self.storage = storage
+        self.draft = draft
+        self.optimizer = PromptOptimizer(api_client=connector)
+
+    def run_stage(self, stage):
+        if stage == "clarify":
+            self.questions = self.optimizer.clarify(self.draft)
+            self.answers = (ANSWERS * 2)[:len(self.questions)]
+        elif stage == "generate":
+            self.prompt = self.optimizer.generate_optimized_prompt(
+                self.draft, self.questions, self.answers)
+        elif stage == "generate_stream":
+            self.prompt = self.optimizer.generate_optimized_prompt(
+                self.draft, self.questions, self.answers, on_token=lambda chunk: None)
+        elif stage == "refine":
+            self.prompt = self.optimizer.refine_optimized_prompt(
+                self.prompt, REFINEMENT, on_token=lambda chunk: None)
+        elif stage == "save":
+            self.storage.save_prompts({
+                "original": self.draft,
+                "optimized": self.prompt,
+                "timestamp": "2025-01-01T00:00:00",
+                "questions": self.questions,
+                "answers": self.answers,
+            })
+
+
+def run_benchmark(iterations=100, warmup=5, alloc_iterations=20, latency=0.0,
+                  response_tokens=300, chunk_tokens=8, seed=0, storage_dir=None, cassette=None,
+                  throughput_requests=200, concurrency=8):
+    """
+    Run every stage `iterations` times and collect statistics.
+
+    Args:
+        iterations: Timed sessions.
+        warmup: Untimed sessions first (template loading, imports, caches).
+        alloc_iterations: Sessions run under tracemalloc for allocation figures.
+        latency: Simulated provider latency per model call, seconds.
+        response_tokens: Simulated response length, words.
+        chunk_tokens: Words per streamed chunk.
+        seed: Seed for the fake responses.
+        storage_dir: Session database directory; a temporary one by default.
+        cassette: Optional Cassette to record real Groq traffic to or replay
+                  it from, instead of the fake client. The latency, token and
+                  seed options are then ignored.
+        throughput_requests: Drafts for the batch.py run and requests for the
+                             send_many run (fake client only; 0 skips both).
+        concurrency: Batch workers / requests in flight in those runs.
+
+    Returns:
+        dict ready to be dumped as JSON
+    """
+    if cassette is None:
+        connector = fake_connector(latency, response_tokens, chunk_tokens, seed)
+        # Whatever sleeps in place of the provider; its wait is not our overhead
+        fake = connector.groq_client
+    else:
+        connector = ModelConnector(cassette=cassette)
+        fake = cassette
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Storage(Path(storage_dir or tmp))
+        try:
+            def session(i):
+                return Session(connector, storage, DRAFTS[i % len(DRAFTS)])
+
+            for i in range(warmup):
+                s = session(i)
+                for stage in Session.STAGES:
+                    s.run_stage(stage)
+
+            walls = {stage: [] for stage in Session.STAGES}
+            overhead = {stage: [] for stage in Session.STAGES}
+            for i in range(iterations):
+                s = session(i)
+                for stage in Session.STAGES:
+                    waited = fake.waited
+                    started = time.perf_counter()
+                    s.run_stage(stage)
+                    elapsed = time.perf_counter() - started
+                    walls[stage].append(elapsed)
+                    overhead[stage].append(elapsed - (fake.waited - waited))
+
+            # Allocation pass: tracemalloc adds a lot of overhead, so it gets its own runs
+            allocated = {stage: [] for stage in Session.STAGES}
+            peaks = {stage: [] for stage in Session.STAGES}
+            tracemalloc.start()
+            try:
+                for i in range(alloc_iterations):
+                    s = session(i)
+                    for stage in Session.STAGES:
+                        tracemalloc.reset_peak()
+                        before, _ = tracemalloc.get_traced_memory()
+                        s.run_stage(stage)
+                        after, peak = tracemalloc.get_traced_memory()
+                        allocated[stage].append(after - before)
+                        peaks[stage].append(peak - before)
+            finally:
+                tracemalloc.stop()
+        finally:
+            storage.close()
+
+    stages = {}
+    for stage in Session.STAGES:
+        stats = summarize(walls[stage], overhead[stage])
+        n = len(peaks[stage]) or 1
+        stats["retained_bytes_per_call"] = round(sum(allocated[stage]) / n)
+        stats["peak_bytes_per_call"] = round(sum(peaks[stage]) / n)
+        stages[stage] = stats
+
+    throughput = {}
+    if cassette is None and throughput_requests:
+        throughput["batch"] = batch_throughput(
+            throughput_requests, concurrency, latency, response_tokens, seed)
+        throughput["send_many"] = send_many_throughput(
+            throughput_requests, concurrency, latency, response_tokens, seed)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "warmup": warmup,
+            "alloc_iterations": alloc_iterations,
+            "latency_s": latency,
+            "response_tokens": response_tokens,
+            "chunk_tokens": chunk_tokens,
+            "seed": seed,
+            "throughput_requests": throughput_requests,
+            "concurrency": concurrency,
+            "cassette": None if cassette is None else {
+                "path": str(cassette.path), "mode": cassette.mode, "realtime": cassette.realtime,
+            },
+        },
+        "stages": stages,
+        "throughput": throughput,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PromptPrompt against a fake model backend")
+    parser.add_argument("--iterations", type=int, default=100, help="timed sessions (default: 100)")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed warm-up sessions")
+    parser.add_argument("--alloc-iterations", type=int, default=20,
+                        help="sessions measured with tracemalloc")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated provider latency per call, seconds")
+    parser.add_argument("--response-tokens", type=int, default=300,
+                        help="simulated response length in words")
+    parser.add_argument("--chunk-tokens", type=int, default=8, help="words per streamed chunk")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--throughput-requests", type=int, default=200,
+                        help="drafts/requests for the concurrent throughput runs (0 to skip)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="requests in flight during the throughput runs")
+    # Recording or replaying a cassette replaces the fake client
+    add_cassette_args(parser)
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    cassette = open_cassette(args)
+
+    result = run_benchmark(
+        iterations=args.iterations,
+        warmup=args.warmup,
+        alloc_iterations=args.alloc_iterations,
+        latency=args.latency,
+        response_tokens=args.response_tokens,
+        chunk_tokens=args.chunk_tokens,
+        seed=args.seed,
+        cassette=cassette,
+        throughput_requests=args.throughput_requests,
+        concurrency=args.concurrency,
+    )
+    text = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Saved {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    # ModelConnector warns on stdout without a key; the fake client doesn't need one
+    if "--record" not in sys.argv:
+        os.environ.setdefault("GROQ_API_KEY", "benchmark-fake-key")
+    main()
@@ -0,0 +1,229 @@
+import gzip
+import json
+import os
+import threading
+import zlib
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from response_cache import ResponseCache
+from usage import chunk_usage
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a request was never recorded"""
+    pass
+
+
+class Cassette:
+    """
+    Recorded model traffic, for running the optimizer offline.
+
+    A cassette is a gzipped JSONL file with one line per model call: the
+    request (model, messages, sampling params), the response text, its token
+    usage and how long the call took. Streamed calls also keep every chunk
+    with its offset from the start of the request, so replay can reproduce
+    time-to-first-token as well as total latency.
+
+    Cassettes sit below ModelConnector, in place of the Groq client (see
+    client()), so the scheduler, usage accounting and everything above it run
+    exactly as they do against the real API.
+
+    In replay mode requests are matched on model, messages and params. A
+    request recorded several times is answered with its recordings in order,
+    and the last one is repeated after that. Streamed and plain recordings
+    serve either kind of call.
+    """
+
+    def __init__(self, path, mode="replay", realtime=False):
+        """
+        Args:
+            path: Cassette file (conventionally *.jsonl.gz).
+            mode: "record" appends calls to the file (created if missing,
+                  so a resumed batch run extends its earlier recording),
+                  "replay" serves an existing one. Delete the file to
+                  record from scratch.
+            realtime: When replaying, sleep for the recorded latency and
+                      chunk gaps instead of answering immediately.
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+
+        self.path = Path(path)
+        self.mode = mode
+        self.realtime = realtime
+        self._lock = threading.Lock()
+        # Replay state: request key -> recordings, and how many were served
+        self._recordings = {}
+        self._served = {}
+        # Seconds slept to reproduce recorded latency, per thread
+        self._local = threading.local()
+
+        if mode == "record":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.exists():
+                entries, complete = _read_entries(self.path)
+                if not complete:
+                    # Cut off the call that was being written when we crashed,
+                    # or nothing appended after it could be read back
+                    self._rewrite(entries)
+        else:
+            if not self.path.exists():
+                raise FileNotFoundError(f"No cassette at {self.path}")
+            for entry in _read_entries(self.path)[0]:
+                self._recordings.setdefault(entry["key"], []).append(entry)
+
+    @property
+    def waited(self):
+        return getattr(self._local, "waited", 0.0)
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+            self._local.waited = self.waited + seconds
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._recordings.values())
+
+    # Same request hash as the response cache (the stream flag isn't part of it)
+    make_key = staticmethod(ResponseCache.make_key)
+
+    def client(self, inner=None):
+        """
+        Object with the Groq client's chat.completions.create interface.
+
+        Args:
+            inner: The real Groq client to record from (record mode only).
+        """
+        if self.mode == "record" and inner is None:
+            raise ValueError("Recording needs a real Groq client")
+        create = self._record if self.mode == "record" else self._replay
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+            create=lambda **kwargs: create(inner, **kwargs))))
+
+    # --- Recording ---
+
+    def _record(self, inner, messages, model, stream=False, **params):
+        started = time.perf_counter()
+        response = inner.chat.completions.create(messages=messages, model=model, stream=stream, **params)
+        entry = {
+            "key": self.make_key(model, messages, params),
+            "model": model,
+            "messages": messages,
+            "params": params,
+        }
+        if not stream:
+            entry["content"] = response.choices[0].message.content
+            entry["usage"] = _usage_dict(getattr(response, "usage", None))
+            entry["latency"] = round(time.perf_counter() - started, 4)
+            self._append(entry)
+            return response
+        return self._record_stream(response, entry, started)
+
+    def _record_stream(self, stream, entry, started):
+        chunks = []
+        usage = None
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                offset = time.perf_counter() - started
+                chunks.append([round(offset, 4), chunk.choices[0].delta.content])
+            usage = chunk_usage(chunk, usage)
+            yield chunk
+        # Only streams read to the end are recorded
+        entry["content"] = "".join(text for _, text in chunks)
+        entry["usage"] = _usage_dict(usage)
+        entry["latency"] = round(time.perf_counter() - started, 4)
+        entry["chunks"] = chunks
+        self._append(entry)
+
+    def _append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            # Each append is its own gzip member; gzip readers concatenate them,
+            # and a crash loses at most the call in flight
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+
+    def _rewrite(self, entries):
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    # --- Replay ---
+
+    def _replay(self, inner, messages, model, stream=False, **params):
+        key = self.make_key(model, messages, params)
+        with self._lock:
+            entries = self._recordings.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded response for this {model} request in {self.path}")
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+        entry = entries[min(served, len(entries) - 1)]
+
+        usage = SimpleNamespace(**{field: entry["usage"].get(field) for field in USAGE_FIELDS}) \
+            if entry.get("usage") else None
+        if not stream:
+            if self.realtime:
+                self._sleep(entry.get("latency", 0))
+            message = SimpleNamespace(content=entry["content"])
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+        return self._replay_stream(entry, usage)
+
+    def _replay_stream(self, entry, usage):
+        # A plain recording is streamed as one chunk at its recorded latency
+        chunks = entry.get("chunks") or [[entry.get("latency", 0), entry["content"]]]
+        started = time.perf_counter()
+        for offset, text in chunks:
+            if self.realtime:
+                self._sleep(offset - (time.perf_counter() - started))
+            delta = SimpleNamespace(content=text)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], x_groq=None, usage=None)
+        yield SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=usage), usage=None)
+
+
+def add_cassette_args(parser):
+    """Add --record / --replay / --realtime to an argparse parser"""
+    traffic = parser.add_mutually_exclusive_group()
+    traffic.add_argument("--record", metavar="CASSETTE",
+                         help="call the real API and append every model call to a cassette file (.jsonl.gz)")
+    traffic.add_argument("--replay", metavar="CASSETTE",
+                         help="answer model calls from a recorded cassette, offline")
+    parser.add_argument("--realtime", action="store_true",
+                        help="with --replay, wait as long as the recorded calls took")
+
+
+def open_cassette(args):
+    """Cassette selected by add_cassette_args' flags, or None"""
+    if args.record:
+        return Cassette(args.record, mode="record")
+    if args.replay:
+        return Cassette(args.replay, mode="replay", realtime=args.realtime)
+    return None
+
+
+def _usage_dict(usage):
+    if usage is None:
+        return None
+    return {field: getattr(usage, field, None) for field in USAGE_FIELDS}
+
+
+def _read_entries(path):
+    """
+    Entries of a cassette file, plus whether it was read to a clean end
+    (False if a crash left a partly written call at the end).
+    """
+    entries = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+    except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError):
+        return entries, False
+    return entries, True
@@ -4,9 +4,15 @@
 # Bring in the Console class from the rich library
 from rich.console import Console
 from rich.panel import Panel
+from rich.live import Live
+from rich.text import Text
+from rich.table import Table
 from datetime import datetime
 import shutil
+import time
 import os
+
+from storage import StorageError
 #from launcher import ChatLauncher
 
 class CLI:
@@ -47,46 +53,120 @@ class CLI:
     def run(self, draft_prompt=None, claude_code_path=None):
         # Main method - this is what starts everything
         self.console.print("[bold magenta] Welcome to PromptPrompt! [/bold magenta]")
+        session_start = time.perf_counter()
 
         # Get the draft prompt (either from parameter or ask user)
         if draft_prompt is None:
             draft_prompt = self.get_draft_prompt()
 
-        # Generate questions from optimizer
-        questions = self.optimizer.clarify(draft_prompt)
-
-        # Ask questions
-        answers = self.collect_answers(questions)
-
-        # Refinement loop - keep improving until user approves
-        improved_prompt = self.refinement_loop(draft_prompt, questions, answers)
+        # A near-duplicate of an earlier draft can reuse that session's prompt
+        saved = self.offer_saved_prompt(draft_prompt)
 
-        # User approved if we get here
-        self.console.print("\n[bold green]Prompt Approved![/bold green]")
-
-        # Save prompts
-        self.console.print("\n Saving prompts...")
-        prompt_pair = {
-            "original": draft_prompt,
-            "optimized": improved_prompt,
-            "timestamp": datetime.now().isoformat()
-        }
-        file_path = self.storage.save_prompts(prompt_pair)
-        self.console.print(f"✓ Saved to: {file_path}")
+        if saved is not None:
+            improved_prompt = saved["optimized"]
+            self.console.print(f"\n[bold green]Reusing saved session #{saved['id']}![/bold green]")
+        else:
+            # Generate questions from optimizer
+            questions = self.optimizer.clarify(draft_prompt)
+
+            # Ask questions
+            answers = self.collect_answers(questions)
+
+            # Refinement loop - keep improving until user approves
+            improved_prompt = self.refinement_loop(draft_prompt, questions, answers)
+
+            # User approved if we get here
+            self.console.print("\n[bold green]Prompt Approved![/bold green]")
+
+            # Save prompts in the background so the launch isn't held up by the disk
+            prompt_pair = {
+                "original": draft_prompt,
+                "optimized": improved_prompt,
+                "timestamp": datetime.now().isoformat(),
+                "questions": questions,
+                "answers": answers,
+                "duration": time.perf_counter() - session_start,
+                **self.session_usage()
+            }
+            pending_save = self.storage.save_prompts_async(prompt_pair)
 
         # Launch AI Session
         self.launcher.launch(improved_prompt, claude_code_path)
 
+        if saved is None:
+            # Usually long done by now; otherwise wait for it before exiting
+            try:
+                session_id = pending_save.result()
+                self.console.print(f"✓ Saved session #{session_id} to: {self.storage.db_path}")
+            except StorageError as exc:
+                self.console.print(f"[red]✗ Could not save this session: {exc}[/red]")
+
         # Exit message
         self.console.print("\n" + "-"*60)
         self.console.print("[bold green] PromptPrompt Complete![/bold green]")
         self.console.print("\n[dim]Summary:[/dim]")
-        self.console.print(f"   • Original prompt optimized")
-        self.console.print(f"   • Prompts saved to ~/.promptprompt/prompts/")
+        if saved is not None:
+            self.console.print(f"   • Saved prompt #{saved['id']} reused (no API calls)")
+        else:
+            self.console.print(f"   • Original prompt optimized")
+            self.console.print(f"   • Prompts saved to {self.storage.db_path}")
         self.console.print(f"   • AI session launched with optimized prompt")
+        self.show_usage()
         self.console.print("\n[dim]Returning terminal control to you...[/dim]")
         self.console.print("-" * 60 + "\n")
 
+    def offer_saved_prompt(self, draft_prompt):
+        # Look for an earlier session with a near-identical draft and offer its prompt.
+        # Returns the session if the user takes it, None to optimize from scratch.
+        try:
+            matches = self.storage.find_similar(draft_prompt, limit=1)
+        except StorageError:
+            # The lookup is only a shortcut - never let it block a session
+            return None
+        if not matches:
+            return None
+
+        match = matches[0]
+        self.console.print(
+            f"\n[bold yellow]You optimized a similar prompt before "
+            f"({match['similarity']:.0%} match, session #{match['id']}, "
+            f"{match['created_at'][:10]}):[/bold yellow]"
+        )
+        self.console.print(Panel(match["original"], title="EARLIER DRAFT", style="cyan", border_style="cyan"))
+        self.console.print(self.optimized_panel(match["optimized"]))
+
+        response = input("\nUse this saved prompt? (y/n): ").lower().strip()
+        while response not in ['y', 'n']:
+            self.console.print("[red]Please enter 'y' for yes or 'n' for no.[/red]")
+            response = input("Use this saved prompt? (y/n): ").lower().strip()
+
+        return match if response == 'y' else None
+
+    def session_usage(self):
+        # Model, token and per-step model time for the session record
+        usage = getattr(self.optimizer.api_client, "usage", None)
+        if usage is None or not usage.records:
+            return {}
+
+        return {
+            "model": ", ".join(usage.by_model()),
+            "usage": usage.totals(),
+            "timings": {
+                purpose: round(totals["wall_time"], 3)
+                for purpose, totals in usage.by_purpose().items()
+            },
+        }
+
+    def show_usage(self):
+        # Print the token usage of this session's model calls
+        usage = getattr(self.optimizer.api_client, "usage", None)
+        if usage is None or not usage.records:
+            return
+
+        self.console.print("\n[dim]Token usage:[/dim]")
+        for line in usage.summary().splitlines():
+            self.console.print(f"   • {line}")
+
     def get_draft_prompt(self):
         # Get the user's initial prompt
         self.console.print("\n[cyan] What would you like help with? [/cyan]")
@@ -137,15 +217,41 @@ class CLI:
         )
 
         # Improved prompt panel
+        self.console.print(self.optimized_panel(improved_prompt))
+
+    def optimized_panel(self, content):
+        # Green panel used for the optimized prompt, both streamed and final
+        return Panel(
+            content,
+            title="OPTIMIZED PROMPT",
+            style="green",
+            border_style="green"
+        )
+
+    def stream_comparison(self, original_prompt, generate):
+        # Like show_comparison, but fills the optimized panel while the model is still writing.
+        # generate is called with an on_token callback and must return the final prompt.
+        self.console.print() # Blank line
+
         self.console.print(
             Panel(
-                improved_prompt,
-                title="OPTIMIZED PROMPT",
-                style="green",
-                border_style="green"
+                original_prompt,
+                title="ORIGINAL PROMPT",
+                style="cyan",
+                border_style="cyan"
             )
         )
 
+        # Text is appended in place; Live redraws it a few times per second
+        streamed = Text()
+        with Live(self.optimized_panel(streamed), console=self.console,
+                  refresh_per_second=12, vertical_overflow="visible") as live:
+            improved_prompt = generate(streamed.append)
+            # Swap in the final text so it renders exactly like show_comparison
+            live.update(self.optimized_panel(improved_prompt))
+
+        return improved_prompt
+
     def get_approval(self):
         # Ask user if they approve the optimized prompt
         response = input("\nDo you approve this prompt? (y/n): ").lower().strip()
@@ -160,20 +266,40 @@ class CLI:
     def refinement_loop(self, draft_prompt, questions, answers):
         # Keep improving the prompt until user approves
         refinements = [] # Store refinement requests
+        improved_prompt = None
 
         while True: # Loop until we return (when user approves)
 
             # Generate improved prompt
 
-            if refinements:
-                # If there are refinements, add them to the prompt
-                refinement_text = " Also: " + ", ".join(refinements)
-                improved_prompt = self.optimizer.generate_optimized_prompt(draft_prompt + refinement_text, questions, answers)
-            else:
+            if not refinements:
                 # First time, no refinements yet
-                improved_prompt = self.optimizer.generate_optimized_prompt(draft_prompt, questions, answers)
-                
-            self.show_comparison(draft_prompt, improved_prompt)
+                generate = lambda on_token: self.optimizer.generate_optimized_prompt(
+                    draft_prompt, questions, answers, on_token=on_token
+                )
+            elif refinements[-1].startswith("!"):
+                # "!" asks for a full regeneration with every refinement so far
+                refinement_text = ", ".join(r.lstrip("!").strip() for r in refinements)
+                generate = lambda on_token: self.optimizer.refine_optimized_prompt(
+                    improved_prompt, refinement_text, on_token=on_token, full=True,
+                    draft_prompt=draft_prompt, questions=questions, answers=answers
+                )
+            else:
+                # Only send the current prompt and the newest change
+                generate = lambda on_token: self.optimizer.refine_optimized_prompt(
+                    improved_prompt, refinements[-1], on_token=on_token
+                )
+
+            # Tokens are drawn into the panel as they arrive
+            improved_prompt = self.stream_comparison(draft_prompt, generate)
+
+            # Tell the user how much of the practices library we didn't have to send
+            report = self.optimizer.last_practices_report
+            if report and report["saved_tokens"] > 0 and not refinements:
+                tiers = ", ".join(str(t) for t in report["tiers"])
+                self.console.print(
+                    f"[dim]Sent TIER {tiers} practices only (~{report['saved_tokens']} input tokens saved)[/dim]"
+                )
 
             # Get approval
             approved = self.get_approval()
@@ -185,12 +311,13 @@ class CLI:
                 # Ask what to change
                 refinement = self.get_refinement()
                 refinements.append(refinement)
-                # Loop continues - generates a new prompt with refinements
+                # Loop continues - refines the prompt with the new request
 
     def get_refinement(self):
         # Ask user what they want to refine
         self.console.print("\n[bold yellow] What would you like to refine?[/bold yellow]")
         self.console.print("[dim]Example: 'Make it more technical' or 'Add focus on security'[/dim]")
+        self.console.print("[dim]Start with '!' to regenerate from scratch instead of editing the current prompt.[/dim]")
 
         refinement = input("\n→ ")
 
@@ -201,6 +328,29 @@ class CLI:
 
         return refinement.strip()
 
+    def search_history(self, query, limit=10):
+        # Show saved sessions matching a full-text query, best match first
+        hits = self.storage.search(query, limit=limit)
+
+        if not hits:
+            self.console.print(f"[yellow]No saved prompts match '{query}'.[/yellow]")
+            return hits
+
+        table = Table(title=f"Saved prompts matching '{query}'", show_lines=True)
+        table.add_column("#", style="dim", justify="right")
+        table.add_column("Date", style="cyan", no_wrap=True)
+        table.add_column("Original", style="white")
+        table.add_column("Match", style="green")
+        for hit in hits:
+            table.add_row(
+                str(hit["id"]),
+                hit["created_at"][:16].replace("T", " "),
+                Text(hit["original"][:80]),
+                Text(hit["snippet"]),
+            )
+        self.console.print(table)
+        return hits
+
     def get_claude_code_path(self):
         """
         Prompt user for Claude Code path and validate it.
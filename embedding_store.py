@@ -0,0 +1,148 @@
+import hashlib
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Callable, List, Sequence
+
+import numpy as np
+
+
+class EmbeddingStore:
+    """
+    Text embeddings persisted on disk and read back through a memory map.
+
+    Each model gets its own directory holding:
+      vectors.f32   - float32 rows of `dim` values, appended in order
+      index.sqlite  - SHA-256 of the text -> row number, plus the dimension
+    Vectors are only ever appended. A row is written and fsynced before it is
+    indexed, so the index never points at data that isn't on disk. Readers map
+    the file instead of loading it, so only the rows actually used are paged
+    into memory.
+    """
+
+    def __init__(self, model_name: str, root: Path | None = None):
+        """
+        Args:
+            model_name: Embedding model the vectors come from; vectors of
+                        different models are kept apart.
+            root: Parent directory. Defaults to .cache/embeddings next to this file.
+        """
+        if root is None:
+            root = Path(__file__).parent / ".cache" / "embeddings"
+
+        self.model_name = model_name
+        self.dir = Path(root) / re.sub(r"[^\w.-]+", "_", model_name)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.dir / "vectors.f32"
+        self.vectors_path.touch(exist_ok=True)
+
+        self.conn = sqlite3.connect(self.dir / "index.sqlite", timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rows (hash TEXT PRIMARY KEY, row INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim = int(row[0]) if row else None
+        self._map = None
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def vectors(self) -> np.ndarray:
+        """
+        Read-only memory map of every indexed row (shape: rows x dim).
+        """
+        if self.dim is None:
+            return np.empty((0, 0), dtype=np.float32)
+        rows = self.conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM rows").fetchone()[0]
+        if self._map is None or self._map.shape[0] != rows:
+            self._map = (np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                   shape=(rows, self.dim))
+                         if rows else np.empty((0, self.dim), dtype=np.float32))
+        return self._map
+
+    def lookup(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Row number of each text, -1 where it isn't stored.
+        """
+        keys = [self.text_key(t) for t in texts]
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ", ".join("?" for _ in chunk)
+            found.update(self.conn.execute(
+                f"SELECT hash, row FROM rows WHERE hash IN ({marks})", chunk
+            ).fetchall())
+        return np.array([found.get(k, -1) for k in keys], dtype=np.int64)
+
+    def add(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        """
+        Append vectors for texts that aren't stored yet.
+
+        Args:
+            texts: Unique texts.
+            vectors: Matching array of shape (len(texts), dim).
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+        row_bytes = self.dim * 4
+        # The write lock serializes appends from several processes
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dim', ?)",
+                              (str(self.dim),))
+            with open(self.vectors_path, "r+b") as f:
+                # Drop a partial row left by a crash mid-append
+                start = os.fstat(f.fileno()).st_size // row_bytes
+                f.truncate(start * row_bytes)
+                f.seek(start * row_bytes)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO rows (hash, row) VALUES (?, ?)",
+                [(self.text_key(t), start + i) for i, t in enumerate(texts)],
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def embed(self, texts: Sequence[str],
+              encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Vectors for texts, encoding and storing only the ones not seen before.
+
+        Args:
+            texts: Texts to embed (duplicates are fine).
+            encode: Batch encoder called with the missing unique texts.
+
+        Returns:
+            Array of shape (len(texts), dim), in input order.
+        """
+        texts = list(texts)
+        rows = self.lookup(texts)
+        missing = list(dict.fromkeys(t for t, r in zip(texts, rows) if r < 0))
+        if missing:
+            self.add(missing, encode(missing))
+            rows = self.lookup(texts)
+        if not texts:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        # Fancy indexing copies just these rows out of the map
+        return np.asarray(self.vectors()[rows])
+
+    def close(self) -> None:
+        self._map = None
+        self.conn.close()
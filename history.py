@@ -0,0 +1,72 @@
+import re
+from typing import Dict, List
+
+from tokens import count_tokens
+
+# The practices library is re-sent in full with every optimization request,
+# so older copies kept in the history are pure duplication
+_PRACTICES_BLOCK = re.compile(r"PROMPTING PRACTICES\n.*?\nEND PRACTICES-", re.DOTALL)
+PRACTICES_PLACEHOLDER = "[Prompting practices omitted - see the latest message]"
+
+
+class ConversationHistory:
+    """
+    Bounded, compacted chat history for PromptOptimizer.
+
+    - Repeated prompting-practices blocks are replaced by a short placeholder
+      when a message is stored.
+    - Only the newest `max_messages` messages are kept (sliding window).
+    - The kept messages are further trimmed, oldest first, until they fit in
+      `max_tokens`.
+    The window always starts on a user message, so pairs stay together.
+    """
+
+    def __init__(self, max_tokens: int = 8000, max_messages: int = 8):
+        """
+        Args:
+            max_tokens: Token budget for the history sent with each request
+            max_messages: Maximum number of messages remembered
+        """
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self.messages: List[Dict[str, str]] = []
+        # Token count of each message, parallel to self.messages
+        self._tokens: List[int] = []
+
+    def append(self, role: str, content: str) -> None:
+        """
+        Store a message, compacting it and dropping old ones as needed
+        """
+        content = _PRACTICES_BLOCK.sub(PRACTICES_PLACEHOLDER, content)
+        self.messages.append({"role": role, "content": content})
+        self._tokens.append(count_tokens(content))
+        self._trim()
+
+    def _trim(self) -> None:
+        def drop_oldest():
+            self.messages.pop(0)
+            self._tokens.pop(0)
+
+        while len(self.messages) > self.max_messages or sum(self._tokens) > self.max_tokens:
+            # Never drop the newest message, even if it alone is over budget
+            if len(self.messages) <= 1:
+                break
+            drop_oldest()
+
+        # Don't start the window with an orphaned assistant reply
+        while len(self.messages) > 1 and self.messages[0]["role"] != "user":
+            drop_oldest()
+
+    def context(self) -> List[Dict[str, str]]:
+        """Messages to send before the next user message"""
+        return [dict(m) for m in self.messages]
+
+    def token_count(self) -> int:
+        return sum(self._tokens)
+
+    def clear(self) -> None:
+        self.messages.clear()
+        self._tokens.clear()
+
+    def __len__(self) -> int:
+        return len(self.messages)
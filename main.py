@@ -1,11 +1,14 @@
 import sys
 import os
+import argparse
 from getpass import getpass
 from dotenv import load_dotenv
 import shutil
 
 # Import your modules
-from api_client import ModelConnector
+from api_client import ModelConnector, ModelConnectorError
+from cassette import add_cassette_args, open_cassette
+from response_cache import ResponseCache
 # from user_auth import UserAuth
 from cli import CLI
 from optimizer import PromptOptimizer
@@ -48,19 +51,47 @@ def setup_api_keys():
         print("✓ Groq Key saved.")
     load_dotenv(ENV_PATH, override=True)
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="PromptPrompt - AI-powered prompt optimizer")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always call the model instead of reusing cached responses")
+    parser.add_argument("--search", metavar="QUERY",
+                        help="search saved prompts instead of starting a session")
+    parser.add_argument("--limit", type=int, default=10,
+                        help="number of search results to show (default: 10)")
+    add_cassette_args(parser)
+    return parser.parse_args(argv)
+
+def search_history(query, limit):
+    """
+    Print saved sessions matching the query. Needs no API key.
+    """
+    storage = Storage()
+    cli_app = CLI(optimizer=None, storage=storage, launcher=None)
+    cli_app.search_history(query, limit=limit)
+
 def main():
+    args = parse_args()
+    if args.search:
+        search_history(args.search, args.limit)
+        return
+
     print("\n" + "*"*50)
     print("   PROMPT PROMPT SYSTEM STARTUP   ")
     print("*"*50 + "\n")
     
     # --- STEP 0: Check & Ask for API Keys ---
-    setup_api_keys()
+    # Replaying a cassette needs no key
+    if not args.replay:
+        setup_api_keys()
 
     # --- STEP 1: Initialize API Connection ---
     print("[System] Initializing AI Models...")
     try:
         # This re-reads the environment variables
-        api = ModelConnector()
+        # Identical requests are answered from disk unless --no-cache is given
+        cache = None if args.no_cache else ResponseCache()
+        api = ModelConnector(cache=cache, cassette=open_cassette(args))
         
         # Verify connection success
         if not api.groq_client and not api.gemini_available:
@@ -79,6 +110,9 @@ def main():
         # Pass the initialized API client to the optimizer
         optimizer = PromptOptimizer(api_client=api)
         storage = Storage()
+        if storage.count_unindexed():
+            print("[System] Older sessions aren't checked for repeated drafts yet. "
+                  "Run `python storage.py index` once to add them.")
         # launcher = ChatLauncher()
         launcher = weblauncher.WebLauncher(use_claude_code=True)
     except Exception as e:
@@ -112,16 +146,20 @@ def main():
         if launcher.use_claude_code and not claude_code_path:
             claude_code_path = cli_app.get_claude_code_path()
             if claude_code_path:
-                # Save to config
-                config = storage.load_config()
+                # Save to config (already loaded in step 3)
                 config["claude_code_path"] = claude_code_path
                 storage.save_config(config)
 
         cli_app.run(claude_code_path=claude_code_path)
     except KeyboardInterrupt:
         print("\n[System] Program interrupted by user.")
+    except ModelConnectorError as e:
+        print(f"\n[Error] The AI model request failed: {e}")
     except Exception as e:
         print(f"\n[Error] An unexpe1cted error occurred in the CLI: {e}")
+    finally:
+        # Make sure queued session/config writes reach the disk before exiting
+        storage.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable
+
+
+class MetricCache:
+    """
+    On-disk cache of evaluation metric values.
+
+    One SQLite table maps a key to a JSON-encoded value. The key is a SHA-256
+    of the metric name, the metric version and the input texts, so a value is
+    reused only while both the texts and the metric implementation (bump its
+    version) are unchanged.
+    """
+
+    # SQLite's default limit on "?" parameters per statement is 999
+    _CHUNK = 500
+
+    def __init__(self, path: Path | None = None):
+        """
+        Args:
+            path: Database file. Defaults to .cache/metrics.sqlite next to this file.
+        """
+        if path is None:
+            path = Path(__file__).parent / ".cache" / "metrics.sqlite"
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS metrics (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(metric: str, version: int, *texts: str) -> str:
+        """
+        Hash a metric and its inputs into a cache key.
+
+        Args:
+            metric: Metric name, e.g. "rouge".
+            version: Metric version; bump it when the implementation changes.
+            texts: The texts the metric is computed from, in order.
+
+        Returns:
+            Hex digest identifying the value.
+        """
+        payload = json.dumps([metric, version, *texts], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, object]:
+        """
+        Look up several keys at once.
+
+        Returns:
+            dict of key -> value for the keys that are cached.
+        """
+        keys = list(keys)
+        found = {}
+        for i in range(0, len(keys), self._CHUNK):
+            chunk = keys[i:i + self._CHUNK]
+            marks = ", ".join("?" for _ in chunk)
+            rows = self.conn.execute(
+                f"SELECT key, value FROM metrics WHERE key IN ({marks})", chunk
+            )
+            found.update((key, json.loads(value)) for key, value in rows)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, values: Dict[str, object]) -> None:
+        """Store key -> value pairs (values must be JSON-serialisable)."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO metrics (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in values.items()],
+            )
+
+    def close(self) -> None:
+        self.conn.close()
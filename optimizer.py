@@ -1,5 +1,9 @@
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
+
+from history import ConversationHistory
+from templates import TemplateRegistry
+from practices import detect_tiers, index_practices, savings_report
 
 class OptimizationError(Exception):
     """Raised when prompt optimization fails"""
@@ -8,41 +12,101 @@ class OptimizationError(Exception):
 class PromptOptimizer:
     """Optimizes prompts using AI with conversation context"""
 
-    def __init__(self, api_client):
+    def __init__(self, api_client, templates: Optional[TemplateRegistry] = None,
+                 history: Optional[ConversationHistory] = None):
         """
         Initialize optimizer with API client
 
         Args:
             api_client: An instance of LLM
+            templates: Optional template registry; by default all optimizers
+                       share one registry for the prompts directory
+            history: Optional history policy (token budget / window size);
+                     defaults to ConversationHistory()
         """
         self.api_client = api_client
-        self.conversation_history = []
+        self.history = history or ConversationHistory()
+        # Tiers detected by the last clarify() call (None = unknown, send everything)
+        self.detected_tiers = None
+        # Token savings from trimming the practices in the last optimization
+        self.last_practices_report = None
 
         # Path to prompts directory
         self.prompts_dir = Path(__file__).parent / "prompts"
-        # Load reusable parts once at initialization
-        self.system_prompt = self._load_prompt("system.txt")
-        self.prompting_practices = self._load_prompt("prompting_practices.txt")
+        self.templates = templates or TemplateRegistry.shared(self.prompts_dir)
+        # Load reusable parts once at initialization (fails early if missing)
+        self._load_prompt("system.txt")
+        self._load_prompt("prompting_practices.txt")
+
+    @property
+    def conversation_history(self) -> List[Dict]:
+        """Messages currently remembered (compacted and bounded)"""
+        return self.history.messages
+
+    @property
+    def system_prompt(self) -> str:
+        return self._load_prompt("system.txt")
+
+    @property
+    def prompting_practices(self) -> str:
+        return self._load_prompt("prompting_practices.txt")
 
     def _load_prompt(self, filename: str) -> str:
         """
         Load a prompt template from file
 
+        Files are read once and cached by the template registry; they are
+        only read again after being modified on disk.
+
         Args:
             filename: Name of the prompt file
 
         Returns:
             Prompt text as string
         """
-        prompt_file = self.prompts_dir / filename
+        try:
+            return self.templates.text(filename)
+        except FileNotFoundError:
+            raise OptimizationError(f"Prompt file not found: {filename}")
+        except Exception as e:
+            raise OptimizationError(f"Error loading prompt: {e}")
+
+    def _render_prompt(self, filename: str, **values) -> str:
+        """
+        Render a prompt template, filling in its {placeholders}
+
+        Args:
+            filename: Name of the prompt file
+            **values: Placeholder values
 
+        Returns:
+            Rendered prompt text
+        """
         try:
-            with open(prompt_file, 'r', encoding='utf-8') as f:
-                return f.read().strip()
+            template = self.templates.get(filename)
         except FileNotFoundError:
             raise OptimizationError(f"Prompt file not found: {filename}")
         except Exception as e:
             raise OptimizationError(f"Error loading prompt: {e}")
+        return template.render(**values)
+
+    def _send(self, message: str, history: Optional[List[Dict]], purpose: str, on_token=None) -> Dict:
+        """
+        Send a message, streaming it through on_token when a callback is given
+
+        purpose ("clarify", "optimize") labels the call in the connector's usage records
+
+        Returns:
+            dict {"content": str}, the same shape as send_message
+        """
+        if on_token is None:
+            return self.api_client.send_message(message, history, purpose=purpose)
+
+        chunks = []
+        for chunk in self.api_client.stream_message(message, history, purpose=purpose):
+            chunks.append(chunk)
+            on_token(chunk)
+        return {"content": "".join(chunks)}
 
     def clarify(self, draft_prompt: str) -> List[str]:
         """
@@ -54,25 +118,21 @@ class PromptOptimizer:
         Returns:
             List of clarifying questions
         """
-        task_instruction = self._load_prompt("task_generate_questions.txt")
-
-        # Build message: System prompt + instructions
-        message = f"{self.system_prompt}\n\n{task_instruction}".format(
+        task_instruction = self._render_prompt(
+            "task_generate_questions.txt",
             draft_prompt=draft_prompt
         )
 
+        # Build message: System prompt + instructions
+        message = f"{self.system_prompt}\n\n{task_instruction}"
+
         # First API call
-        response = self.api_client.send_message(message)
-
-        # Save to conversation history for context
-        self.conversation_history.append({
-            "role": "user",
-            "content": message
-        })
-        self.conversation_history.append({
-            "role": "assistant",
-            "content": response["content"]
-        })
+        response = self._send(message, None, "clarify")
+
+        # Save to conversation history for context. The questions template is
+        # only needed for this call, so later turns just see the draft.
+        self.history.append("user", f"Ask clarifying questions for this draft prompt: {draft_prompt}")
+        self.history.append("assistant", response["content"])
 
         # Parse questions from response
         # Helpd with claude ai
@@ -87,9 +147,31 @@ class PromptOptimizer:
                 question = re.sub(r'^\d+[\.\)]\s+', '', line)
                 questions.append(question)
 
+        # Remember the tier so only its practices are sent in the next step
+        self.detected_tiers = detect_tiers(response["content"], len(questions))
+
         return questions
 
-    def generate_optimized_prompt(self, draft_prompt: str, questions: List[str], answers: List[str]) -> str:
+    def select_practices(self, tiers=None) -> str:
+        """
+        Prompting practices for the given tiers plus the shared core rules
+
+        Args:
+            tiers: Tier numbers; defaults to the tiers detected by clarify().
+                   If no tier is known, the full practices text is returned.
+
+        Returns:
+            Practices text to send to the model
+        """
+        if tiers is None:
+            tiers = self.detected_tiers
+
+        index = index_practices(self.prompting_practices)
+        self.last_practices_report = savings_report(index, tiers)
+        return index.select(tiers)
+
+    def generate_optimized_prompt(self, draft_prompt: str, questions: List[str], answers: List[str],
+                                  on_token: Optional[Callable[[str], None]] = None) -> str:
         """
         Generate optimized prompt based on user answers (STEPS 3-5)
 
@@ -97,6 +179,8 @@ class PromptOptimizer:
             draft_prompt: Original prompt
             questions: Questions that were asked
             answers: User's answers
+            on_token: Optional callback; when given, the response is streamed
+                      and each text chunk is passed to it as it arrives
 
         Returns:
             Optimized prompt as a string
@@ -115,7 +199,7 @@ class PromptOptimizer:
         #help of claude AI
         message = (
             f"PROMPTING PRACTICES\n"
-            f"{self.prompting_practices}\n"
+            f"{self.select_practices()}\n"
             f"END PRACTICES-\n\n"
             f"{task_instruction}\n\n"
             f"Original draft prompt: {draft_prompt}\n\n"
@@ -123,19 +207,57 @@ class PromptOptimizer:
         )
 
         # Second API call WITH conversation history
-        response = self.api_client.send_message(
-            message,
-            self.conversation_history
+        response = self._send(message, self.history.context(), "optimize", on_token)
+
+        # Save to conversation history (the practices block is compacted away)
+        self.history.append("user", message)
+        self.history.append("assistant", response["content"])
+
+        return response["content"].strip()
+
+    def refine_optimized_prompt(self, current_prompt: str, refinement: str,
+                                on_token: Optional[Callable[[str], None]] = None,
+                                full: bool = False, draft_prompt: Optional[str] = None,
+                                questions: Optional[List[str]] = None,
+                                answers: Optional[List[str]] = None) -> str:
+        """
+        Apply one refinement to an already optimized prompt (STEP 5 loop)
+
+        By default only the current prompt and the new instruction are sent,
+        which is much smaller than the practices + Q&A of a full generation.
+
+        Args:
+            current_prompt: The latest optimized prompt
+            refinement: What the user wants changed
+            on_token: Optional streaming callback, as in generate_optimized_prompt
+            full: Regenerate from scratch instead; needs draft_prompt,
+                  questions and answers (refinement is appended to the draft)
+            draft_prompt: Original prompt, for full regeneration
+            questions: Questions that were asked, for full regeneration
+            answers: User's answers, for full regeneration
+
+        Returns:
+            Refined prompt as a string
+        """
+        if full:
+            if draft_prompt is None or questions is None or answers is None:
+                raise OptimizationError(
+                    "Full regeneration needs the draft prompt, questions and answers"
+                )
+            return self.generate_optimized_prompt(
+                f"{draft_prompt} Also: {refinement}", questions, answers, on_token=on_token
+            )
+
+        message = self._render_prompt(
+            "task_refine.txt",
+            current_prompt=current_prompt,
+            refinement=refinement
         )
 
-        # Save to conversation history
-        self.conversation_history.append({
-            "role": "user",
-            "content": message
-        })
-        self.conversation_history.append({
-            "role": "assistant",
-            "content": response["content"]
-        })
+        # Everything the model needs is in the message, so no history is sent
+        response = self._send(message, None, "refine", on_token)
+
+        self.history.append("user", message)
+        self.history.append("assistant", response["content"])
 
         return response["content"].strip()
@@ -0,0 +1,150 @@
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from tokens import count_tokens
+
+ALL_TIERS = frozenset({1, 2, 3})
+
+_RULE = re.compile(r"^=+$")
+_TIER = re.compile(r"TIER\s+(\d)")
+# Block headings inside a section: "### Few-Shot Prompting" or "**TIER 2:**"
+_BLOCK_HEADING = re.compile(r"^(###\s|\*\*TIER\s+\d:\*\*)")
+
+
+def _tiers_in(text: str) -> FrozenSet[int]:
+    return frozenset(int(t) for t in _TIER.findall(text))
+
+
+class PracticesIndex:
+    """
+    prompting_practices.txt split into tier-tagged chunks.
+
+    The file is a series of sections framed by ==== rules. A section whose
+    title names a tier ("TIER 2: MEDIUM PROMPT TEMPLATE") belongs to that tier.
+    Other sections are split into blocks at "###" / "**TIER n:**" headings, and
+    a block belongs to the tiers named in its heading or its "**When:**" line.
+    Everything without a tier (or marked "ALL tiers") is shared core text.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        # (chunk text, tiers); an empty tier set means "always include"
+        self.chunks: List[Tuple[str, FrozenSet[int]]] = []
+        self._parse(text.split("\n"))
+        # Tier set (None = everything) -> token count of its selection
+        self._token_counts: Dict[Optional[FrozenSet[int]], int] = {}
+
+    def _parse(self, lines: List[str]) -> None:
+        current: List[str] = []
+        tiers: FrozenSet[int] = frozenset()
+        whole_section = False
+        tiers_from_heading = False
+
+        def flush():
+            if current:
+                self.chunks.append(("\n".join(current) + "\n", tiers))
+                current.clear()
+
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+
+            # ==== / TITLE / ==== starts a new section
+            if (_RULE.match(line) and i + 2 < len(lines)
+                    and _RULE.match(lines[i + 2]) and lines[i + 1].strip()):
+                flush()
+                title = lines[i + 1]
+                tiers = frozenset() if "ALL" in title.upper() else _tiers_in(title)
+                whole_section = bool(tiers)
+                tiers_from_heading = whole_section
+                current.extend(lines[i:i + 3])
+                i += 3
+                continue
+
+            if not whole_section and _BLOCK_HEADING.match(line):
+                flush()
+                tiers = _tiers_in(line)
+                tiers_from_heading = bool(tiers)
+            elif not tiers_from_heading and line.startswith("**When:**"):
+                tiers = frozenset() if "ALL" in line.upper() else _tiers_in(line)
+
+            current.append(line)
+            i += 1
+        flush()
+
+    def select(self, tiers: Optional[Iterable[int]]) -> str:
+        """
+        Text containing the shared core plus the chunks for the given tiers
+
+        Args:
+            tiers: Tier numbers to keep; None keeps everything
+
+        Returns:
+            The reduced practices text, in original order
+        """
+        if tiers is None:
+            return self.text
+        wanted = frozenset(tiers)
+        return "".join(
+            chunk for chunk, chunk_tiers in self.chunks
+            if not chunk_tiers or chunk_tiers & wanted
+        ).strip()
+
+    def token_count(self, tiers: Optional[Iterable[int]] = None) -> int:
+        """Tokens in select(tiers), counted once per tier set"""
+        key = None if tiers is None else frozenset(tiers)
+        if key not in self._token_counts:
+            self._token_counts[key] = count_tokens(self.select(key))
+        return self._token_counts[key]
+
+    def section_count(self, tiers: Optional[Iterable[int]] = None) -> int:
+        """Number of chunks that select() would include"""
+        if tiers is None:
+            return len(self.chunks)
+        wanted = frozenset(tiers)
+        return sum(1 for _, t in self.chunks if not t or t & wanted)
+
+
+@lru_cache(maxsize=4)
+def index_practices(text: str) -> PracticesIndex:
+    """Parse the practices text once; re-parsed only when the text changes"""
+    return PracticesIndex(text)
+
+
+def detect_tiers(response: str, question_count: int) -> Optional[Set[int]]:
+    """
+    Work out the complexity tier from the clarifying-questions response.
+
+    The question prompt asks the model to start with a "TIER: n" line. If it
+    didn't, fall back to the question counts the tiers call for (TIER 1: 2-3,
+    TIER 2: 3-4, TIER 3: 4-5) and keep every tier that fits.
+
+    Returns:
+        Set of candidate tiers, or None if nothing could be inferred
+    """
+    match = re.search(r"^\W*TIER\W*([123])\b", response, re.IGNORECASE | re.MULTILINE)
+    if match:
+        return {int(match.group(1))}
+
+    by_count = {t for t, (lo, hi) in {1: (2, 3), 2: (3, 4), 3: (4, 5)}.items()
+                if lo <= question_count <= hi}
+    if not by_count and question_count:
+        by_count = {1} if question_count < 2 else {3}
+    return by_count or None
+
+
+def savings_report(index: PracticesIndex, tiers: Optional[Iterable[int]]) -> dict:
+    """
+    Token counts for the full practices text vs. the tier-specific selection
+    """
+    # Counted once per index and tier set; the practices text rarely changes
+    full_tokens = index.token_count(None)
+    sent_tokens = index.token_count(tiers)
+    return {
+        "tiers": sorted(tiers) if tiers is not None else sorted(ALL_TIERS),
+        "sections": index.section_count(tiers),
+        "full_tokens": full_tokens,
+        "sent_tokens": sent_tokens,
+        "saved_tokens": full_tokens - sent_tokens,
+    }
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache for LLM responses.
+
+    Each response is stored as <cache_dir>/<key[:2]>/<key>.json, where the key
+    is a SHA-256 of the model, the full message list and the sampling params.
+    A file's mtime is bumped on every hit, so evicting the oldest mtimes first
+    gives least-recently-used eviction. Entries unused for longer than max_age
+    are dropped.
+    """
+
+    def __init__(self, cache_dir: Path | None = None,
+                 max_bytes: int = 50 * 1024 * 1024,
+                 max_age: float = 7 * 24 * 3600):
+        """
+        Args:
+            cache_dir: Directory for cache files. Defaults to .cache/responses
+                       next to this file.
+            max_bytes: Total size above which least recently used entries are evicted.
+            max_age: Seconds without a hit after which an entry is considered stale.
+        """
+        if cache_dir is None:
+            cache_dir = Path(__file__).parent / ".cache" / "responses"
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Running total, recomputed whenever we scan the directory
+        self._total_bytes = 0
+        self.prune()
+
+    @staticmethod
+    def make_key(model: str, messages: list, params: dict | None = None) -> str:
+        """
+        Hash a request into a cache key.
+
+        Args:
+            model: Model name.
+            messages: Full list of chat messages sent to the model.
+            params: Sampling parameters (temperature, top_p, ...).
+
+        Returns:
+            Hex digest identifying the request.
+        """
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params or {}},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> str | None:
+        """
+        Look up a cached response.
+
+        Returns:
+            The cached content, or None on a miss or a stale entry.
+        """
+        path = self._path(key)
+        try:
+            stat = path.stat()
+            if time.time() - stat.st_mtime > self.max_age:
+                self._remove(path, stat.st_size)
+                raise FileNotFoundError(path)
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            # Mark as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return entry["content"]
+
+    def put(self, key: str, content: str) -> None:
+        """
+        Store a response, then evict old entries if the cache is over budget.
+        """
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        data = json.dumps({"content": content, "created": time.time()}, ensure_ascii=False)
+
+        # Write to a temp file first so readers never see half an entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(data, encoding="utf-8")
+        size = tmp_path.stat().st_size
+
+        with self._lock:
+            # Replacing an entry frees the old one's bytes
+            try:
+                replaced = path.stat().st_size
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            self._total_bytes += size - replaced
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Drop stale entries, then least recently used ones until under max_bytes.
+
+        Returns:
+            Total size in bytes of the entries that remain.
+        """
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+        with self._lock:
+            self._total_bytes = total
+        return total
+
+    def _remove(self, path: Path, size: int = 0) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            self._total_bytes = max(0, self._total_bytes - size)
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict with hits, misses, hit_rate and the current size in bytes.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes": self._total_bytes,
+            }
@@ -0,0 +1,176 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Optional, Tuple, Type
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    The bucket holds at most `capacity` units and refills at `capacity` per
+    `period` seconds. reserve() takes units immediately (the balance may go
+    negative) and returns how long the caller has to wait before its share
+    is actually available, so concurrent callers queue up fairly instead of
+    all retrying at once.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def clamp(self, amount: float) -> float:
+        """What reserve(amount) actually takes"""
+        # A single request larger than the bucket could otherwise never run
+        return min(float(amount), self.capacity)
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take `amount` units.
+
+        Returns:
+            Seconds to wait before the reservation is covered (0 if available now)
+        """
+        amount = self.clamp(amount)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level -= amount
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def give_back(self, amount: float) -> None:
+        """Return units that were reserved but not used (negative to take more)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RequestScheduler:
+    """
+    Admission control and retries for model calls.
+
+    Before each call, one request and the estimated token count are taken from
+    the requests-per-minute and tokens-per-minute buckets, waiting if either is
+    empty. Calls failing with one of the `retry_on` exception types are retried
+    with jittered exponential backoff; if the exception carries a `retry_after`
+    (seconds) hint, that wait is used instead and every caller sharing this
+    scheduler pauses until it has passed.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        """
+        Args:
+            requests_per_minute: Request limit; None means unlimited.
+            tokens_per_minute: Token limit; None means unlimited.
+            max_retries: Retries after the first attempt before giving up.
+            base_delay: First backoff delay in seconds (doubles on every retry).
+            max_delay: Upper bound for a single backoff delay.
+        """
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Set after a rate-limit response: nobody sends before this time
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _admission_delay(self, tokens: int) -> float:
+        delay = 0.0
+        if self.request_bucket:
+            delay = max(delay, self.request_bucket.reserve(1))
+        if self.token_bucket and tokens:
+            delay = max(delay, self.token_bucket.reserve(tokens))
+        with self._lock:
+            delay = max(delay, self._paused_until - time.monotonic())
+        return delay
+
+    def _retry_delay(self, attempt: int, exc: Exception) -> float:
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after is not None:
+            # Honour the provider's hint, plus a little jitter to spread callers out
+            delay = float(retry_after) + random.uniform(0, self.base_delay)
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            return delay
+        # "Full jitter" exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def reservation(self, estimated_tokens: int) -> int:
+        """
+        Tokens run() will actually reserve for an estimate (estimates larger
+        than the whole per-minute budget are capped to it)
+        """
+        if not self.token_bucket:
+            return estimated_tokens
+        return int(self.token_bucket.clamp(estimated_tokens))
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """
+        Correct the token bucket once the real usage of a call is known
+
+        Args:
+            estimated_tokens: What was passed to run() for the call
+            actual_tokens: What the API reported; None leaves the estimate in place
+        """
+        if self.token_bucket and actual_tokens is not None:
+            # Settle against what reserve() took, not the uncapped estimate,
+            # or a capped call would hand back budget it never got
+            self.token_bucket.give_back(self.reservation(estimated_tokens) - actual_tokens)
+
+    def run(self, call: Callable, estimated_tokens: int = 0,
+            retry_on: Tuple[Type[Exception], ...] = ()):
+        """
+        Run call() once admitted, retrying on the given exception types
+
+        Args:
+            call: Zero-argument function performing the request
+            estimated_tokens: Tokens to reserve from the tokens-per-minute bucket
+            retry_on: Exception types that are worth retrying
+
+        Returns:
+            Whatever call() returns
+
+        Raises:
+            The last exception once retries are exhausted, or any
+            exception not listed in retry_on immediately
+        """
+        attempt = 0
+        while True:
+            delay = self._admission_delay(estimated_tokens if attempt == 0 else 0)
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                return call()
+            except retry_on as exc:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt, exc))
+                attempt += 1
+
+    async def arun(self, call: Callable, estimated_tokens: int = 0,
+                   retry_on: Tuple[Type[Exception], ...] = ()):
+        """
+        asyncio version of run(); call() must return an awaitable
+        """
+        attempt = 0
+        while True:
+            delay = self._admission_delay(estimated_tokens if attempt == 0 else 0)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await call()
+            except retry_on as exc:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt, exc))
+                attempt += 1
@@ -0,0 +1,64 @@
+import hashlib
+import random
+import re
+import struct
+from typing import List, Set
+
+# 64 hash functions, split into 16 LSH bands of 4 rows. Two texts share at
+# least one band with probability 1 - (1 - J^4)^16, which is ~0.5 at
+# Jaccard 0.5 and ~0.98 at Jaccard 0.7.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+SHINGLE_SIZE = 4
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20251128)  # fixed seed: signatures must be stable across runs
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Character n-grams of the normalized text (robust to small rewordings)"""
+    text = normalize(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(text: str) -> List[int]:
+    """
+    MinHash signature of a text
+
+    Returns:
+        NUM_PERM integers; the fraction of equal positions between two
+        signatures estimates the Jaccard similarity of the shingle sets
+    """
+    hashed = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+        for s in shingles(text)
+    ]
+    if not hashed:
+        return [_PRIME] * NUM_PERM
+    return [min((a * h + b) % _PRIME for h in hashed) for a, b in _PERMS]
+
+
+def band_keys(signature: List[int]) -> List[str]:
+    """One bucket key per LSH band; similar texts collide in at least one band"""
+    return [
+        hashlib.blake2b(
+            struct.pack(f"<{ROWS}Q", *signature[i * ROWS:(i + 1) * ROWS]), digest_size=8
+        ).hexdigest()
+        for i in range(BANDS)
+    ]
@@ -1,8 +1,20 @@
 from __future__ import annotations
 
+from concurrent.futures import Future
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
+import atexit
+import copy
 import json
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+
+import similarity
 
 try:
     from promptprompt.exceptions import StorageError
@@ -13,27 +25,173 @@ except ImportError:
         pass
 
 
+class BackgroundWriter:
+    """
+    Runs write jobs one at a time, in submission order, on a daemon thread.
+
+    The queue is bounded: if the disk falls far behind, submit() blocks
+    instead of piling up unwritten data in memory. Pending jobs are flushed
+    at interpreter exit; call flush() to wait for them earlier.
+    """
+
+    def __init__(self, max_pending: int = 64):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._closed:
+                raise StorageError("Storage writer is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="storage-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                future, fn, args = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as exc:
+                    future.set_exception(exc)
+                    # Nobody may be waiting on this one, so don't fail silently
+                    print(f"[Storage] Background write failed: {exc}", file=sys.stderr)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fn, *args) -> Future:
+        """
+        Queue fn(*args) to run on the writer thread.
+
+        Returns:
+            Future: resolves to fn's return value, or holds its exception.
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((future, fn, args))
+        return future
+
+    def flush(self) -> None:
+        """Block until every job submitted so far has finished"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Finish pending jobs and stop the thread. Safe to call twice."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+            atexit.unregister(self.close)
+
+
 class Storage:
     """
     Storage component for PromptPrompt.
-    Saves ONE .txt file per session inside ~/.promptprompt/prompts/
+    Keeps every session in an SQLite database (WAL mode) inside the storage
+    directory, and the launcher config in launcher_config.json.
+
+    save_prompts_async() and save_config() hand the write to a background
+    thread so they never hold up the caller; call flush() or close() to wait
+    for them.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id                INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at        TEXT NOT NULL,      -- ISO-8601 timestamp
+            original          TEXT NOT NULL,
+            optimized         TEXT NOT NULL,
+            questions         TEXT,               -- JSON list
+            answers           TEXT,               -- JSON list
+            model             TEXT,
+            prompt_tokens     INTEGER,
+            completion_tokens INTEGER,
+            total_tokens      INTEGER,
+            duration          REAL,               -- seconds, whole session
+            timings           TEXT,               -- JSON object, seconds per step
+            source            TEXT UNIQUE         -- imported .txt file name
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (created_at);
+        CREATE INDEX IF NOT EXISTS idx_sessions_model ON sessions (model, created_at);
+    """
+
+    # Full-text (inverted) index over the prompts, kept in sync by triggers
+    FTS_SCHEMA = """
+        CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts USING fts5(
+            original, optimized,
+            content='sessions', content_rowid='id',
+            tokenize='porter unicode61'
+        );
+        CREATE TRIGGER IF NOT EXISTS sessions_fts_insert AFTER INSERT ON sessions BEGIN
+            INSERT INTO sessions_fts (rowid, original, optimized)
+            VALUES (new.id, new.original, new.optimized);
+        END;
+        CREATE TRIGGER IF NOT EXISTS sessions_fts_delete AFTER DELETE ON sessions BEGIN
+            INSERT INTO sessions_fts (sessions_fts, rowid, original, optimized)
+            VALUES ('delete', old.id, old.original, old.optimized);
+        END;
+        CREATE TRIGGER IF NOT EXISTS sessions_fts_update AFTER UPDATE ON sessions BEGIN
+            INSERT INTO sessions_fts (sessions_fts, rowid, original, optimized)
+            VALUES ('delete', old.id, old.original, old.optimized);
+            INSERT INTO sessions_fts (rowid, original, optimized)
+            VALUES (new.id, new.original, new.optimized);
+        END;
+    """
+
+    # LSH buckets of each session's MinHash signature, for near-duplicate
+    # lookup of drafts (see similarity.py)
+    SIMILARITY_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS session_lsh (
+            band       INTEGER NOT NULL,
+            bucket     TEXT NOT NULL,
+            session_id INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_session_lsh_bucket ON session_lsh (band, bucket);
+        CREATE INDEX IF NOT EXISTS idx_session_lsh_session ON session_lsh (session_id);
+        CREATE TRIGGER IF NOT EXISTS session_lsh_delete AFTER DELETE ON sessions BEGIN
+            DELETE FROM session_lsh WHERE session_id = old.id;
+        END;
     """
 
     def __init__(self, base_dir: Path | None = None):
         """
-        Initialize storage directory.
+        Initialize storage directory and session database.
 
         Args:
             base_dir: Optional base directory override, mainly for testing.
-                      Defaults to ~/.promptprompt/prompts/
+                      Defaults to prompts/optimized prompts/. When given, the
+                      launcher config is kept there too.
         """
         if base_dir is None:
             # base_dir = Path.home() / ".promptprompt" / "prompts"
             base_dir = Path(__file__).parent / "prompts" / "optimized prompts"
+            # Config file is in the project root, not in prompts folder
+            config_dir = Path(__file__).parent
+        else:
+            config_dir = Path(base_dir)
 
         self.base_dir = Path(base_dir)
-        # Config file is in the project root, not in prompts folder
-        self.config_file = Path(__file__).parent / "launcher_config.json"
+        self.db_path = self.base_dir / "sessions.db"
+        self.config_file = config_dir / "launcher_config.json"
+        # Parsed once by load_config(), then kept up to date by save_config()
+        self._config: dict | None = None
+        self._config_lock = threading.Lock()
+        self.writer = BackgroundWriter()
 
         try:
             # Create directory if it doesn't exist
@@ -41,35 +199,192 @@ class Storage:
         except Exception as exc:
             raise StorageError(f"Failed to create storage directory: {exc}") from exc
 
-    def save_prompts(self, prompt_pair: dict) -> Path:
+        try:
+            conn = self._connect()
+            try:
+                # executescript runs in its own transaction
+                conn.executescript(self.SCHEMA)
+                self.fts_enabled = self._create_search_index(conn)
+            finally:
+                conn.close()
+            self._create_similarity_index()
+        except sqlite3.Error as exc:
+            raise StorageError(f"Failed to open session database: {exc}") from exc
+
+    def _create_search_index(self, conn: sqlite3.Connection) -> bool:
+        """
+        Create the full-text index, filling it from existing sessions the
+        first time (databases created before search existed).
+
+        Returns:
+            bool: False if this SQLite build has no FTS5; search() then
+                  falls back to a plain scan.
+        """
+        existed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sessions_fts'"
+        ).fetchone()
+        try:
+            conn.executescript(self.FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            return False
+        if not existed:
+            conn.execute("INSERT INTO sessions_fts (sessions_fts) VALUES ('rebuild')")
+        return True
+
+    def _create_similarity_index(self) -> None:
+        """
+        Create the near-duplicate index. Sessions saved before it existed are
+        not added here (that can take minutes on a big database); see
+        index_similarity().
+        """
+        conn = self._connect()
+        try:
+            conn.executescript(self.SIMILARITY_SCHEMA)
+        finally:
+            conn.close()
+
+    _UNINDEXED = """
+        SELECT id, original FROM sessions
+        WHERE id NOT IN (SELECT session_id FROM session_lsh)
+    """
+
+    def count_unindexed(self) -> int:
+        """Number of sessions not yet in the near-duplicate index."""
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM ({self._UNINDEXED})").fetchone()[0]
+        finally:
+            conn.close()
+
+    def index_similarity(self, batch_size: int = 250, verbose: bool = True) -> int:
         """
-        Saves a session file:
-            YYYY-MM-DD-HHMMSS-session.txt
+        Add sessions saved before the near-duplicate index existed (a one-off
+        migration for older databases; new sessions are indexed on save).
 
-        File contents format:
+        Each batch is committed in its own short transaction, so other
+        processes can save sessions between batches, and an interrupted run
+        just continues where it stopped next time.
 
-        ========================================
-        PromptPrompt Session
-        Date: YYYY-MM-DD HH:MM:SS
-        ========================================
+        Args:
+            batch_size: Sessions per transaction.
+            verbose: Print progress to stderr.
 
-        ORIGINAL PROMPT:
-        ...
+        Returns:
+            int: number of sessions indexed.
+        """
+        total = self.count_unindexed()
+        done = 0
+        last_id = 0
+        try:
+            while True:
+                conn = self._connect()
+                try:
+                    rows = conn.execute(
+                        self._UNINDEXED + " AND id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                    ).fetchall()
+                finally:
+                    conn.close()
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+                # Hash outside the transaction; only the inserts hold the write lock
+                keys = {row["id"]: similarity.band_keys(similarity.minhash(row["original"]))
+                        for row in rows}
+                with self._transaction() as conn:
+                    marks = ", ".join("?" for _ in keys)
+                    # Another process may have indexed some of them meanwhile
+                    taken = {r[0] for r in conn.execute(
+                        f"SELECT DISTINCT session_id FROM session_lsh WHERE session_id IN ({marks})",
+                        list(keys),
+                    )}
+                    conn.executemany(
+                        "INSERT INTO session_lsh (band, bucket, session_id) VALUES (?, ?, ?)",
+                        [(band, key, session_id)
+                         for session_id, bands in keys.items() if session_id not in taken
+                         for band, key in enumerate(bands)],
+                    )
+                done += len(keys)
+                if verbose:
+                    print(f"[Storage] Indexed {min(done, total)}/{total} sessions for duplicate detection",
+                          file=sys.stderr)
+        except sqlite3.Error as exc:
+            raise StorageError(f"Failed to index sessions: {exc}") from exc
+        return done
+
+    def _index_similarity(self, conn: sqlite3.Connection, session_id: int, original: str) -> None:
+        keys = similarity.band_keys(similarity.minhash(original))
+        conn.executemany(
+            "INSERT INTO session_lsh (band, bucket, session_id) VALUES (?, ?, ?)",
+            [(band, key, session_id) for band, key in enumerate(keys)],
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open a connection. WAL lets readers run while another process writes;
+        the busy timeout makes concurrent writers wait instead of failing.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
 
-        OPTIMIZED PROMPT:
-        ...
-        ========================================
+    @contextmanager
+    def _transaction(self):
+        """
+        Yield a connection inside BEGIN IMMEDIATE ... COMMIT.
+
+        Taking the write lock up front means two processes saving at the same
+        time are serialized by SQLite rather than failing halfway through.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def save_prompts(self, prompt_pair: dict) -> int:
+        """
+        Saves a session to the database.
 
         Args:
             prompt_pair: dict with keys:
                 - "original": original prompt (str-like)
                 - "optimized": optimized prompt (str-like)
                 - "timestamp": ISO-8601 timestamp string
+              and optionally:
+                - "questions", "answers": lists of strings
+                - "model": model name
+                - "usage": dict with prompt_tokens / completion_tokens / total_tokens
+                - "timings": dict of step name -> seconds
+                - "duration": total seconds for the session
+
+        Returns:
+            int: id of the saved session. (Versions that saved .txt files
+            returned the file's Path instead.)
+        """
+        return self._write_session(self._session_row(prompt_pair))
+
+    def save_prompts_async(self, prompt_pair: dict) -> Future:
+        """
+        Like save_prompts(), but the write happens on the background writer.
+
+        prompt_pair is validated before returning, so a malformed session
+        still raises StorageError right away.
 
         Returns:
-            Path: path to the saved file.
+            Future: resolves to the id of the saved session.
         """
+        return self.writer.submit(self._write_session, self._session_row(prompt_pair))
 
+    def _session_row(self, prompt_pair: dict) -> dict:
         required_keys = {"original", "optimized", "timestamp"}
         if not required_keys.issubset(prompt_pair):
             missing = required_keys - set(prompt_pair)
@@ -77,50 +392,274 @@ class Storage:
                 f"prompt_pair missing required fields: {', '.join(sorted(missing))}"
             )
 
-        original = str(prompt_pair["original"])
-        optimized = str(prompt_pair["optimized"])
         timestamp_str = str(prompt_pair["timestamp"])
-
         try:
             dt = datetime.fromisoformat(timestamp_str)
         except Exception:
             dt = datetime.now()
 
-        # File name format: 2025-11-28-143022-session.txt
-        filename = dt.strftime("%Y-%m-%d-%H%M%S-session.txt")
-        file_path = self.base_dir / filename
-
-        content_lines = [
-            "========================================",
-            "PromptPrompt Session",
-            f"Date: {dt.strftime('%Y-%m-%d %H:%M:%S')}",
-            "========================================",
-            "",
-            "ORIGINAL PROMPT:",
-            original,
-            "",
-            "OPTIMIZED PROMPT:",
-            optimized,
-            "========================================",
-            "",
-        ]
-        content = "\n".join(content_lines)
-
-        # Write to file
-        try:
-            file_path.write_text(content, encoding="utf-8")
-        except Exception as exc:
-            raise StorageError(f"Failed to write file: {exc}") from exc
+        usage = prompt_pair.get("usage") or {}
+        timings = prompt_pair.get("timings")
+        return {
+            "created_at": dt.isoformat(),
+            "original": str(prompt_pair["original"]),
+            "optimized": str(prompt_pair["optimized"]),
+            "questions": _json_or_none(prompt_pair.get("questions")),
+            "answers": _json_or_none(prompt_pair.get("answers")),
+            "model": prompt_pair.get("model"),
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+            "total_tokens": usage.get("total_tokens"),
+            "duration": prompt_pair.get("duration"),
+            "timings": _json_or_none(timings),
+            "source": prompt_pair.get("source"),
+        }
+
+    def _write_session(self, row: dict) -> int:
+        try:
+            with self._transaction() as conn:
+                return self._insert_session(conn, row)
+        except sqlite3.Error as exc:
+            raise StorageError(f"Failed to save session: {exc}") from exc
+
+    def _insert_session(self, conn: sqlite3.Connection, row: dict) -> int:
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{name}" for name in row)
+        cursor = conn.execute(
+            f"INSERT OR IGNORE INTO sessions ({columns}) VALUES ({placeholders})", row
+        )
+        if not cursor.rowcount:
+            return 0
+        self._index_similarity(conn, cursor.lastrowid, row["original"])
+        return cursor.lastrowid
+
+    def get_session(self, session_id: int) -> dict | None:
+        """
+        Load one session.
 
-        return file_path
+        Returns:
+            dict with all stored fields (JSON fields decoded), or None.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        except sqlite3.Error as exc:
+            raise StorageError(f"Failed to load session: {exc}") from exc
+        finally:
+            conn.close()
+        return _row_to_session(row) if row else None
+
+    def list_sessions(self, limit: int = 20, model: str | None = None,
+                      since: str | None = None) -> list[dict]:
+        """
+        Most recent sessions first.
+
+        Args:
+            limit: Maximum number of sessions to return.
+            model: Only sessions that used this model.
+            since: Only sessions at or after this ISO-8601 timestamp.
+        """
+        query = "SELECT * FROM sessions"
+        conditions, params = [], []
+        if model is not None:
+            conditions.append("model = ?")
+            params.append(model)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        except sqlite3.Error as exc:
+            raise StorageError(f"Failed to list sessions: {exc}") from exc
+        finally:
+            conn.close()
+        return [_row_to_session(row) for row in rows]
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """
+        Full-text search over original and optimized prompts.
+
+        Every word must match (stemmed, case-insensitive); the last word also
+        matches as a prefix so partially typed queries work. Results are
+        ranked by BM25 relevance.
+
+        Args:
+            query: Free text typed by the user.
+            limit: Maximum number of hits.
+
+        Returns:
+            list of dicts with id, created_at, model, original, optimized,
+            snippet and score (lower is better), best match first.
+        """
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+
+        conn = self._connect()
+        try:
+            if self.fts_enabled:
+                # Quote every word so FTS5 operators in user input are inert
+                match = " ".join(f'"{w}"' for w in words[:-1])
+                match = f'{match} "{words[-1]}"*'.strip()
+
+                # Rank first, then build snippets for the top hits only;
+                # computing snippets for every match is the expensive part
+                ranked = conn.execute(
+                    """
+                    SELECT rowid, bm25(sessions_fts) AS score FROM sessions_fts
+                    WHERE sessions_fts MATCH ? ORDER BY score LIMIT ?
+                    """,
+                    (match, limit),
+                ).fetchall()
+                scores = {row["rowid"]: row["score"] for row in ranked}
+                marks = ", ".join("?" for _ in scores)
+                rows = conn.execute(
+                    f"""
+                    SELECT s.id, s.created_at, s.model, s.original, s.optimized,
+                           snippet(sessions_fts, -1, '[', ']', '...', 12) AS snippet
+                    FROM sessions_fts
+                    JOIN sessions s ON s.id = sessions_fts.rowid
+                    WHERE sessions_fts MATCH ? AND sessions_fts.rowid IN ({marks})
+                    """,
+                    (match, *scores),
+                ).fetchall() if scores else []
+                hits = [dict(row, score=scores[row["id"]]) for row in rows]
+                return sorted(hits, key=lambda hit: hit["score"])
+            else:
+                conditions = " AND ".join(
+                    "(original LIKE ? OR optimized LIKE ?)" for _ in words
+                )
+                params = [p for w in words for p in (f"%{w}%", f"%{w}%")]
+                rows = conn.execute(
+                    f"""
+                    SELECT id, created_at, model, original, optimized,
+                           substr(original, 1, 80) AS snippet, 0 AS score
+                    FROM sessions WHERE {conditions}
+                    ORDER BY created_at DESC LIMIT ?
+                    """,
+                    (*params, limit),
+                ).fetchall()
+        except sqlite3.Error as exc:
+            raise StorageError(f"Failed to search sessions: {exc}") from exc
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def find_similar(self, draft: str, threshold: float = 0.7, limit: int = 3) -> list[dict]:
+        """
+        Saved sessions whose original draft is a near-duplicate of `draft`.
+
+        LSH buckets narrow the candidates down to sessions sharing at least
+        one band with the draft, so the lookup doesn't scan every session;
+        the candidates are then scored by exact Jaccard similarity of their
+        character shingles.
+
+        Args:
+            draft: The draft prompt about to be optimized.
+            threshold: Minimum similarity (0-1) to count as a match.
+            limit: Maximum number of matches.
+
+        Returns:
+            list of session dicts with an added "similarity", best first.
+        """
+        draft_shingles = similarity.shingles(draft)
+        if not draft_shingles:
+            return []
+        keys = similarity.band_keys(similarity.minhash(draft))
+        bands = " OR ".join("(band = ? AND bucket = ?)" for _ in keys)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"""
+                SELECT * FROM sessions WHERE id IN (
+                    SELECT session_id FROM session_lsh WHERE {bands}
+                )
+                """,
+                [p for band, key in enumerate(keys) for p in (band, key)],
+            ).fetchall()
+        except sqlite3.Error as exc:
+            raise StorageError(f"Failed to look up similar sessions: {exc}") from exc
+        finally:
+            conn.close()
+
+        matches = []
+        for row in rows:
+            score = similarity.jaccard(draft_shingles, similarity.shingles(row["original"]))
+            if score >= threshold:
+                matches.append(dict(_row_to_session(row), similarity=score))
+        # Most similar first; the newest session wins a tie
+        matches.sort(key=lambda m: (m["similarity"], m["created_at"]), reverse=True)
+        return matches[:limit]
+
+    def count_sessions(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        finally:
+            conn.close()
+
+    def import_text_sessions(self, directory: Path | None = None) -> int:
+        """
+        One-shot import of the old YYYY-MM-DD-HHMMSS-session.txt files.
+
+        Files are recorded by name, so running the import again skips the
+        ones already imported.
+
+        Args:
+            directory: Folder with the .txt files. Defaults to base_dir.
+
+        Returns:
+            int: number of sessions imported.
+        """
+        directory = Path(directory) if directory is not None else self.base_dir
+        rows = []
+        for path in sorted(directory.glob("*-session.txt")):
+            parsed = _parse_session_file(path.read_text(encoding="utf-8"))
+            if parsed is None:
+                continue
+            created_at, original, optimized = parsed
+            rows.append({
+                "created_at": created_at,
+                "original": original,
+                "optimized": optimized,
+                "source": path.name,
+            })
+
+        imported = 0
+        try:
+            # One transaction for the whole import: far faster than one per file
+            with self._transaction() as conn:
+                for row in rows:
+                    if self._insert_session(conn, row):
+                        imported += 1
+        except sqlite3.Error as exc:
+            raise StorageError(f"Failed to import sessions: {exc}") from exc
+        return imported
 
     def load_config(self) -> dict:
         """
         Load application configuration from launcher_config.json.
 
+        The file is read once; later calls return the in-memory copy, which
+        save_config() keeps current.
+
         Returns:
-            dict: Configuration dictionary. Empty dict if file doesn't exist.
+            dict: Configuration dictionary (a copy - edit it and pass it to
+                  save_config()). Empty dict if file doesn't exist.
         """
+        with self._config_lock:
+            if self._config is None:
+                self._config = self._read_config()
+            return copy.deepcopy(self._config)
+
+    def _read_config(self) -> dict:
         if not self.config_file.exists():
             return {}
 
@@ -130,27 +669,109 @@ class Storage:
         except Exception as exc:
             raise StorageError(f"Failed to load config: {exc}") from exc
 
-    def save_config(self, config: dict) -> None:
+    def save_config(self, config: dict) -> Future:
         """
         Save application configuration to launcher_config.json.
 
+        The in-memory config is updated immediately; the file is written in
+        the background, atomically, so a crash never leaves it half-written.
+
         Args:
             config: Configuration dictionary to save.
+
+        Returns:
+            Future: resolves once the file is on disk.
         """
+        snapshot = copy.deepcopy(config)
+        with self._config_lock:
+            self._config = snapshot
+        return self.writer.submit(self._write_config, snapshot)
+
+    def _write_config(self, config: dict) -> None:
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2)
+            _atomic_write_text(self.config_file, json.dumps(config, indent=2))
         except Exception as exc:
             raise StorageError(f"Failed to save config: {exc}") from exc
 
+    def flush(self) -> None:
+        """Wait until every queued session and config write is on disk"""
+        self.writer.flush()
+
+    def close(self) -> None:
+        """Flush pending writes and stop the background writer"""
+        self.writer.close()
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    """
+    Replace path with text: write a temp file next to it, fsync, then rename
+    over the original, so readers see either the old or the new file.
+    """
+    tmp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+def _json_or_none(value):
+    return None if value is None else json.dumps(value, ensure_ascii=False)
+
+
+def _row_to_session(row: sqlite3.Row) -> dict:
+    session = dict(row)
+    for key in ("questions", "answers", "timings"):
+        if session.get(key) is not None:
+            session[key] = json.loads(session[key])
+    return session
+
+
+def _parse_session_file(text: str):
+    """
+    Parse the old text session format written by earlier versions.
+
+    Returns:
+        (created_at ISO string, original, optimized), or None if unrecognised.
+    """
+    marker_original = "ORIGINAL PROMPT:\n"
+    marker_optimized = "\n\nOPTIMIZED PROMPT:\n"
+    rule = "\n========================================"
+    if marker_original not in text or marker_optimized not in text:
+        return None
+
+    date_line = next((l for l in text.splitlines() if l.startswith("Date: ")), None)
+    try:
+        created_at = datetime.strptime(date_line[6:], "%Y-%m-%d %H:%M:%S").isoformat()
+    except (TypeError, ValueError):
+        return None
+
+    body = text.split(marker_original, 1)[1]
+    original, optimized = body.split(marker_optimized, 1)
+    optimized = optimized.rsplit(rule, 1)[0]
+    return created_at, original, optimized
+
 
-# manual test
+# manual test / one-shot import of old text sessions:
+#   python storage.py            save a test session
+#   python storage.py import     import prompts/optimized prompts/*-session.txt
+#   python storage.py index      add older sessions to the near-duplicate index
 if __name__ == "__main__":
     storage = Storage()
-    test_data = {
-        "original": "write a blog post",
-        "optimized": "Write a 500-word blog post about AI tools...",
-        "timestamp": "2025-11-28T14:30:22",
-    }
-    path = storage.save_prompts(test_data)
-    print("Saved to:", path)
+    if sys.argv[1:2] == ["import"]:
+        directory = Path(sys.argv[2]) if len(sys.argv) > 2 else None
+        print("Imported sessions:", storage.import_text_sessions(directory))
+        print("Indexed sessions:", storage.index_similarity())
+    elif sys.argv[1:2] == ["index"]:
+        print("Indexed sessions:", storage.index_similarity())
+    else:
+        test_data = {
+            "original": "write a blog post",
+            "optimized": "Write a 500-word blog post about AI tools...",
+            "timestamp": "2025-11-28T14:30:22",
+        }
+        session_id = storage.save_prompts(test_data)
+        print(f"Saved session #{session_id} to:", storage.db_path)
@@ -0,0 +1,106 @@
+import string
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class CompiledTemplate:
+    """
+    A prompt template pre-split around its {placeholders}.
+
+    Rendering only joins the literal parts with the supplied values, so the
+    template text is parsed once instead of on every str.format call.
+    Escaped braces ({{ and }}) behave exactly as they do with str.format.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        # List of (literal_text, field_name, format_spec, conversion)
+        self.parts: List[Tuple[str, Optional[str], str, Optional[str]]] = list(
+            string.Formatter().parse(text)
+        )
+        self.fields = {name for _, name, _, _ in self.parts if name is not None}
+
+    def render(self, **values) -> str:
+        """
+        Fill in the placeholders
+
+        Args:
+            **values: One value per placeholder name
+
+        Returns:
+            The rendered text
+
+        Raises:
+            KeyError: if a placeholder has no value, like str.format
+        """
+        out = []
+        for literal, name, spec, conversion in self.parts:
+            out.append(literal)
+            if name is None:
+                continue
+            value = values[name]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "a":
+                value = ascii(value)
+            out.append(format(value, spec) if spec else str(value))
+        return "".join(out)
+
+
+class TemplateRegistry:
+    """
+    Loads prompt files once and keeps them compiled in memory.
+
+    Every lookup does a cheap stat() and only re-reads a file when its
+    modification time (or size) changed, so templates can still be edited
+    while the program is running.
+    """
+
+    _shared: Dict[Path, "TemplateRegistry"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, prompts_dir: Path):
+        self.prompts_dir = Path(prompts_dir)
+        self._entries: Dict[str, Tuple[int, int, CompiledTemplate]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, prompts_dir: Path) -> "TemplateRegistry":
+        """
+        Return the process-wide registry for a directory, creating it on first use
+        """
+        prompts_dir = Path(prompts_dir).resolve()
+        with cls._shared_lock:
+            if prompts_dir not in cls._shared:
+                cls._shared[prompts_dir] = cls(prompts_dir)
+            return cls._shared[prompts_dir]
+
+    def get(self, filename: str) -> CompiledTemplate:
+        """
+        Get the compiled template for a file, reloading it if it changed on disk
+
+        Raises:
+            FileNotFoundError: if the file does not exist
+        """
+        path = self.prompts_dir / filename
+        stat = path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self._entries.get(filename)
+        if entry is not None and entry[:2] == version:
+            return entry[2]
+
+        with self._lock:
+            text = path.read_text(encoding="utf-8").strip()
+            template = CompiledTemplate(text)
+            self._entries[filename] = (*version, template)
+        return template
+
+    def text(self, filename: str) -> str:
+        """Raw (stripped) text of a prompt file"""
+        return self.get(filename).text
+
+    def render(self, filename: str, **values) -> str:
+        """Render a prompt file with the given placeholder values"""
+        return self.get(filename).render(**values)
@@ -7,84 +7,205 @@
 #     openai/gpt-oss-20b
 #     llama-3.3-70b-versatile
 
+import argparse
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
-import transformers
-transformers.logging.set_verbosity_error()
-import matplotlib.pyplot as plt
-import gzip
-import nltk
-import tiktoken
-from sentence_transformers import SentenceTransformer, util
-from bert_score import score as bertscore
-from rouge_score import rouge_scorer
-import textstat
-from sklearn.feature_extraction.text import TfidfVectorizer
-
-# NLTK Setup
-nltk.download("punkt")
-nltk.download("averaged_perceptron_tagger")
+
+from embedding_store import EmbeddingStore
+from metric_cache import MetricCache
+import text_metrics
+
+# The models, tokenizers, NLTK data and plotting library are loaded the
+# first time a metric needs them, so importing this module is cheap and a
+# run of the light metrics never touches the network.
 
 GOOGLE_SHEET_URL = (
     "https://docs.google.com/spreadsheets/d/1BETDr9PA-W0zxKLYW-2Bjj5kFzlhbQeDC1Dc963LOjI/export?format=csv"
 )
 
-def load_cases(url):
-    df = pd.read_csv(url)
-    cases = []
-    for idx, row in df.iterrows():
-        cid = idx + 1
-        cases.append({
-            "id": cid,
-            "prompt_before": str(row["prompt_before"]),
-            "prompt_after": str(row["prompt_after"]),
-            "before_output": str(row["before_output"]),
-            "after_output": str(row["after_output"]),
-        })
-    return cases
-
-FILE_CASES = load_cases(GOOGLE_SHEET_URL)
+CASE_COLUMNS = ["prompt_before", "prompt_after", "before_output", "after_output"]
+
+def _table_format(source):
+    suffix = Path(str(source).split("?")[0]).suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if suffix == ".parquet":
+        return "parquet"
+    return "csv"
+
+def get_parquet():
+    # pyarrow is optional; only Parquet input needs it
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError(
+            "Reading .parquet cases needs pyarrow (pip install pyarrow), "
+            "or convert the file to CSV/JSONL."
+        ) from exc
+    return pq
+
+def read_table(source):
+    # CSV (local file or URL, e.g. the Google Sheet export), JSONL or Parquet
+    fmt = _table_format(source)
+    if fmt == "jsonl":
+        return pd.read_json(source, lines=True)
+    if fmt == "parquet":
+        return get_parquet().read_table(source).to_pandas()
+    return pd.read_csv(source)
+
+def iter_tables(source, chunk_size):
+    # Same formats as read_table, but yields DataFrames of up to chunk_size rows
+    fmt = _table_format(source)
+    if fmt == "parquet":
+        pq = get_parquet()
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+        return
+    reader = (pd.read_json(source, lines=True, chunksize=chunk_size) if fmt == "jsonl"
+              else pd.read_csv(source, chunksize=chunk_size))
+    with reader:
+        yield from reader
+
+def cases_from_frame(df, source="input", first_id=1):
+    """
+    Case dicts from a table with prompt_before, prompt_after, before_output
+    and after_output columns. An "id" column is used if present; otherwise
+    cases are numbered from first_id in row order.
+    """
+    missing = [c for c in CASE_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"{source} is missing column(s): {', '.join(missing)}")
+
+    ids = df["id"] if "id" in df.columns else range(first_id, first_id + len(df))
+    columns = [df[c] for c in CASE_COLUMNS]
+    return [
+        {"id": cid, **{c: str(v) for c, v in zip(CASE_COLUMNS, values)}}
+        for cid, *values in zip(ids, *columns)
+    ]
+
+def load_cases(source=GOOGLE_SHEET_URL):
+    # Every case in memory at once; see iter_case_chunks for large datasets
+    return cases_from_frame(read_table(source), source)
+
+def iter_case_chunks(source, chunk_size=10_000):
+    # Cases in lists of up to chunk_size, reading only one chunk at a time
+    next_id = 1
+    for df in iter_tables(source, chunk_size):
+        cases = cases_from_frame(df, source, next_id)
+        next_id += len(cases)
+        yield cases
 
 # Metric Functions
 
-st_model = SentenceTransformer("all-MiniLM-L6-v2")
-rouge = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
+ST_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Inference backends for the model-based metrics (CPU hosts):
+#   torch - full-precision PyTorch (reference)
+#   onnx  - sentence embeddings through ONNX Runtime
+#   int8  - int8-quantized ONNX sentence embeddings, plus BERTScore with
+#           dynamically int8-quantized linear layers (bert_score only runs
+#           on PyTorch, so that is the closest equivalent)
+BACKENDS = ("torch", "onnx", "int8")
+
+# Pre-quantized ONNX files shipped in the all-MiniLM-L6-v2 model repository
+ONNX_INT8_FILES = {
+    "arm64": "onnx/model_qint8_arm64.onnx",
+    "aarch64": "onnx/model_qint8_arm64.onnx",
+}
+ONNX_INT8_DEFAULT = "onnx/model_quint8_avx2.onnx"
+
+def embedding_model_id(backend="torch"):
+    # Different backends give (slightly) different vectors; keep them apart
+    return ST_MODEL_NAME if backend == "torch" else f"{ST_MODEL_NAME}-{backend}"
+
+@lru_cache(maxsize=None)
+def get_st_model(backend="torch"):
+    from sentence_transformers import SentenceTransformer
+    if backend == "onnx":
+        return SentenceTransformer(ST_MODEL_NAME, backend="onnx")
+    if backend == "int8":
+        file_name = ONNX_INT8_FILES.get(platform.machine().lower(), ONNX_INT8_DEFAULT)
+        return SentenceTransformer(ST_MODEL_NAME, backend="onnx",
+                                   model_kwargs={"file_name": file_name})
+    return SentenceTransformer(ST_MODEL_NAME)
+
+# Texts per forward pass when embedding outputs
+EMBED_BATCH_SIZE = 64
+
+def embed_texts(texts, batch_size=EMBED_BATCH_SIZE, store=None, backend="torch"):
+    # Unit-length embeddings in one batched encode. With an EmbeddingStore,
+    # texts embedded by an earlier run are read from disk instead.
+    def encode(batch):
+        return get_st_model(backend).encode(batch, batch_size=batch_size,
+                                            convert_to_numpy=True, normalize_embeddings=True)
+    if store is None:
+        return encode(list(texts))
+    return store.embed(texts, encode)
+
+def semantic_similarities(before_list, after_list, batch_size=EMBED_BATCH_SIZE, store=None,
+                          backend="torch"):
+    # Row-wise cosine similarity in one step; the embeddings are unit
+    # length, so the cosine is just the dot product
+    e1 = embed_texts(before_list, batch_size, store, backend)
+    e2 = embed_texts(after_list, batch_size, store, backend)
+    return np.einsum("ij,ij->i", e1, e2)
 
 def semantic_similarity(a, b):
-    e1 = st_model.encode(a, convert_to_tensor=True)
-    e2 = st_model.encode(b, convert_to_tensor=True)
-    return float(util.cos_sim(e1, e2))
+    return float(semantic_similarities([a], [b])[0])
+
+# Pairs per BERTScore forward pass
+BERT_BATCH_SIZE = 64
+
+@lru_cache(maxsize=None)
+def get_bert_scorer(backend="torch"):
+    # Built once: loading the model is most of the cost of a bert_score call
+    import transformers
+    from bert_score import BERTScorer
+    transformers.logging.set_verbosity_error()
+    scorer = BERTScorer(lang="en")
+    if backend == "int8" and str(scorer.device) == "cpu":
+        import torch
+        scorer._model = torch.ao.quantization.quantize_dynamic(
+            scorer._model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return scorer
+
+def bert_backend(backend):
+    # BERTScore has no ONNX path: "onnx" scores it with the PyTorch model
+    return "int8" if backend == "int8" else "torch"
+
+def bert_scores(cands, refs, batch_size=BERT_BATCH_SIZE, backend="torch"):
+    # F1 for every (cand, ref) pair, in input order
+    _, _, F1 = get_bert_scorer(bert_backend(backend)).score(cands, refs, verbose=False, batch_size=batch_size)
+    return F1.cpu().numpy()
 
 def bert_single(a, b):
-    _, _, F1 = bertscore([a], [b], lang="en", verbose=False)
-    return float(F1.mean())
-
-def rouge_single(a, b):
-    return rouge.score(a, b)["rougeL"].fmeasure
-
-def info_density(text):
-    tokens = nltk.word_tokenize(text)
-    tags = nltk.pos_tag(tokens)
-    content_tags = [
-        "NN","NNS","NNP","NNPS",
-        "VB","VBD","VBG","VBN","VBP","VBZ",
-        "JJ","JJR","JJS",
-        "RB","RBR","RBS"
-    ]
-    if len(tokens) == 0:
-        return 0
-    cw = sum(1 for w, t in tags if t in content_tags)
-    return cw / len(tokens)
+    return float(bert_scores([a], [b])[0])
+
+TOKEN_MODEL = "gpt-4o-mini"
 
-def compression_rate(text):
-    raw = text.encode("utf-8")
-    comp = gzip.compress(raw)
-    return len(comp) / len(raw) if len(raw) > 0 else 0
+@lru_cache(maxsize=None)
+def get_encoder(model=TOKEN_MODEL):
+    # Resolving the encoding is far more expensive than encoding a text
+    import tiktoken
+    return tiktoken.encoding_for_model(model)
 
-def count_tokens(text, model="gpt-4o-mini"):
-    enc = tiktoken.encoding_for_model(model)
-    return len(enc.encode(text))
+def count_tokens(text, model=TOKEN_MODEL):
+    return len(get_encoder(model).encode(text))
+
+def token_counts(texts, model=TOKEN_MODEL):
+    # encode_batch tokenizes on tiktoken's thread pool, outside the GIL
+    return [len(ids) for ids in get_encoder(model).encode_batch(list(texts))]
 
 def build_coverage_fn(before_list, after_list):
+    from sklearn.feature_extraction.text import TfidfVectorizer
     vec = TfidfVectorizer()
     vec.fit(before_list + after_list)
     def cov(text):
@@ -94,12 +215,18 @@ def build_coverage_fn(before_list, after_list):
 
 # ROI Calculation
 
+ROI_COLUMNS = ["output_similarity", "tokens_before", "tokens_after"]
+
 def compute_roi(df, baseline_attempts=3):
-    avg_semantic_score = df["output_similarity"].mean() * 100
+    return roi_from_means({c: df[c].mean() for c in ROI_COLUMNS}, baseline_attempts)
+
+def roi_from_means(means, baseline_attempts=3):
+    # means: average output_similarity, tokens_before and tokens_after
+    avg_semantic_score = means["output_similarity"] * 100
     iter_reduction = (baseline_attempts - 1) / baseline_attempts * 100
 
-    avg_before_tokens = df["tokens_before"].mean()
-    avg_after_tokens = df["tokens_after"].mean()
+    avg_before_tokens = means["tokens_before"]
+    avg_after_tokens = means["tokens_after"]
 
     baseline_total = baseline_attempts * avg_before_tokens
     tool_total = avg_after_tokens
@@ -113,96 +240,431 @@ def compute_roi(df, baseline_attempts=3):
         "avg_time": 0.8
     }
 
-# MAIN TEST FUNCTION
-
-def run_tests():
-    results = []
-
-    before_outputs = [c["before_output"] for c in FILE_CASES]
-    after_outputs = [c["after_output"] for c in FILE_CASES]
-    coverage_fn = build_coverage_fn(before_outputs, after_outputs)
-
-    for case in FILE_CASES:
-        cid = case["id"]
-        pb = case["prompt_before"]
-        pa = case["prompt_after"]
-        ob = case["before_output"]
-        oa = case["after_output"]
-
-        sim_o = semantic_similarity(ob, oa)
-        bert_o = bert_single(ob, oa)
-        rouge_o = rouge_single(ob, oa)
-
-        read_b = textstat.flesch_reading_ease(ob)
-        read_a = textstat.flesch_reading_ease(oa)
-
-        info_b = info_density(ob)
-        info_a = info_density(oa)
-
-        comp_b = compression_rate(ob)
-        comp_a = compression_rate(oa)
-
-        cov_b = coverage_fn(ob)
-        cov_a = coverage_fn(oa)
-
-        tok_b = count_tokens(ob)
-        tok_a = count_tokens(oa)
-
-        results.append({
-            "id": cid,
-            "output_similarity": sim_o,
-            "bert_score": bert_o,
-            "rouge": rouge_o,
-            "output_read_before": read_b,
-            "output_read_after": read_a,
-            "info_density_before": info_b,
-            "info_density_after": info_a,
-            "compression_before": comp_b,
-            "compression_after": comp_a,
-            "coverage_before": cov_b,
-            "coverage_after": cov_a,
-            "tokens_before": tok_b,
-            "tokens_after": tok_a,
-        })
+def print_roi(roi):
+    print("\n===== ROI METRICS =====")
+    print("Semantic quality score:", round(roi["semantic_quality_score"], 2), "%")
+    print("Iteration reduction:", round(roi["iteration_reduction"], 2), "%")
+    print("Token reduction:", round(roi["token_reduction"], 2), "%")
+    print("Average optimization time:", roi["avg_time"], "sec")
 
-    df = pd.DataFrame(results)
-    df.to_csv("evaluation_results_clean.csv", index=False)
-    print("Saved evaluation_results_clean.csv")
+# Metric registry
+
+# Bump a metric's version whenever its implementation changes, so values
+# cached by the old implementation are recomputed
+METRIC_VERSIONS = {
+    "semantic_similarity": 1,
+    "bert_score": 1,
+    "rouge": 1,
+    "readability": 1,
+    "info_density": 1,
+    "compression": 1,
+    "coverage": 1,
+    "tokens": 1,
+}
+
+# Metrics computed by a neural model, affected by the backend choice
+MODEL_METRICS = {"semantic_similarity", "bert_score"}
+
+def metric_backend(name, backend):
+    # Backend that actually computes a metric (and so keys its cached values)
+    if name not in MODEL_METRICS:
+        return "torch"
+    return bert_backend(backend) if name == "bert_score" else backend
+
+# Metrics comparing a case's before and after output -> result column
+PAIR_COLUMNS = {
+    "semantic_similarity": "output_similarity",
+    "bert_score": "bert_score",
+    "rouge": "rouge",
+}
+
+# Metrics of a single output -> result column prefix (_before / _after)
+TEXT_COLUMNS = {
+    "readability": "output_read",
+    "info_density": "info_density",
+    "compression": "compression",
+    "coverage": "coverage",
+    "tokens": "tokens",
+}
+
+def coverage_counts(texts):
+    """
+    Number of TF-IDF features present in each text (what build_coverage_fn
+    returns per text), from one fit_transform over all of them.
+
+    The vocabulary is fitted on the texts themselves, so every term of a
+    text is in it and the count depends only on that text - which is what
+    makes coverage safe to cache per text.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    texts = list(texts)
+    try:
+        matrix = TfidfVectorizer().fit_transform(texts)
+    except ValueError:
+        # No terms in any of the texts (e.g. all empty): nothing is covered
+        return [0] * len(texts)
+    # TF-IDF weights of present terms are always > 0, so the stored entries
+    # per row are exactly the features the text covers
+    return matrix.getnnz(axis=1)
+
+def metric_functions(batch_size=EMBED_BATCH_SIZE, bert_batch_size=BERT_BATCH_SIZE,
+                     embedding_store=None, backend="torch"):
+    # Batch implementations of the metrics computed in this process. Each
+    # takes a list of input tuples - (before, after) for pair metrics,
+    # (text,) for text metrics - and returns one value per tuple
+    return {
+        "semantic_similarity": lambda inputs: semantic_similarities(
+            [b for b, _ in inputs], [a for _, a in inputs], batch_size, embedding_store, backend),
+        "bert_score": lambda inputs: bert_scores(
+            [b for b, _ in inputs], [a for _, a in inputs], bert_batch_size, backend),
+        "coverage": lambda inputs: coverage_counts([t for (t,) in inputs]),
+        "tokens": lambda inputs: token_counts([t for (t,) in inputs]),
+        # The pure-CPU ones; with workers they run in a process pool instead
+        **{name: partial(text_metrics.compute_chunk, name) for name in text_metrics.CPU_METRICS},
+    }
 
-    # Token usage plot
+# Below this many inputs a metric isn't worth shipping to worker processes
+MIN_PARALLEL_INPUTS = 64
+
+def _plain(value):
+    # numpy scalars -> int / float, so values can be cached as JSON
+    return value.item() if hasattr(value, "item") else value
+
+def compute_metrics(cases, cache=None, batch_size=EMBED_BATCH_SIZE,
+                    bert_batch_size=BERT_BATCH_SIZE, workers=None, metrics=None,
+                    pool=None, verbose=True, embedding_store=None, backend="torch"):
+    """
+    Every metric for every case, one result dict per case in case order.
+
+    Each metric runs once over the unique inputs that aren't cached yet, so
+    a re-run after editing a few cases only computes those cases. The
+    pure-CPU metrics (text_metrics.CPU_METRICS) are split into chunks on a
+    process pool and run while the model-based metrics use this process;
+    chunk results are reassembled in order, so the output is identical to
+    a serial run.
+
+    Args:
+        cases: Case dicts as returned by load_cases
+        cache: MetricCache, or None to compute everything
+        batch_size: Texts per embedding forward pass
+        bert_batch_size: Pairs per BERTScore forward pass
+        workers: Worker processes for the CPU metrics; None uses every
+                 core, 1 runs everything in this process
+        metrics: Names of the metrics to compute (keys of METRIC_VERSIONS);
+                 None computes all of them
+        pool: ProcessPoolExecutor to reuse across calls; by default one is
+              started (and shut down) here when there is enough work
+        verbose: Print computed / cached counts per metric
+        embedding_store: EmbeddingStore for sentence embeddings, so texts
+                         embedded before skip the model
+        backend: Inference backend for the model-based metrics (see BACKENDS)
+    """
+    metrics = list(METRIC_VERSIONS) if metrics is None else list(metrics)
+    unknown = [m for m in metrics if m not in METRIC_VERSIONS]
+    if unknown:
+        raise ValueError(f"Unknown metric(s): {', '.join(unknown)}")
+
+    functions = metric_functions(batch_size, bert_batch_size, embedding_store, backend)
+    pairs = list(dict.fromkeys((c["before_output"], c["after_output"]) for c in cases))
+    texts = [(t,) for t in dict.fromkeys(t for pair in pairs for t in pair)]
+    inputs = {name: pairs for name in PAIR_COLUMNS if name in metrics}
+    inputs.update({name: texts for name in TEXT_COLUMNS if name in metrics})
+
+    # Cache lookup for every metric first, so we know what's left to compute
+    keys, values, missing = {}, {}, {}
+    for name, metric_inputs in inputs.items():
+        version = METRIC_VERSIONS[name]
+        # Non-reference backends cache their model-based scores separately
+        computed_by = metric_backend(name, backend)
+        cache_name = name if computed_by == "torch" else f"{name}@{computed_by}"
+        keys[name] = {inp: MetricCache.make_key(cache_name, version, *inp) for inp in metric_inputs}
+        values[name] = cache.get_many(keys[name].values()) if cache is not None else {}
+        missing[name] = [inp for inp in metric_inputs if keys[name][inp] not in values[name]]
+
+    workers = workers or os.cpu_count() or 1
+    parallel = [
+        name for name in text_metrics.CPU_METRICS
+        if name in inputs and workers > 1 and len(missing[name]) >= MIN_PARALLEL_INPUTS
+    ]
+    own_pool = pool is None and bool(parallel)
+    if own_pool:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = {
+            name: text_metrics.submit_chunks(pool, name, missing[name], workers)
+            for name in parallel
+        }
+        computed = {}
+        for name in inputs:
+            if name not in pending and missing[name]:
+                computed[name] = functions[name](missing[name])
+        for name, futures in pending.items():
+            computed[name] = [v for future in futures for v in future.result()]
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    for name in inputs:
+        new = {
+            keys[name][inp]: _plain(v)
+            for inp, v in zip(missing[name], computed.get(name, []))
+        }
+        if cache is not None and new:
+            cache.put_many(new)
+        values[name].update(new)
+        if verbose:
+            print(f"  {name}: {len(missing[name])} computed, "
+                  f"{len(inputs[name]) - len(missing[name])} cached")
+
+    results = [{"id": c["id"]} for c in cases]
+    for row, c in zip(results, cases):
+        pair = (c["before_output"], c["after_output"])
+        for name, column in PAIR_COLUMNS.items():
+            if name in inputs:
+                row[column] = values[name][keys[name][pair]]
+        for name, prefix in TEXT_COLUMNS.items():
+            if name not in inputs:
+                continue
+            row[f"{prefix}_before"] = values[name][keys[name][(pair[0],)]]
+            row[f"{prefix}_after"] = values[name][keys[name][(pair[1],)]]
+    return results
+
+# Plots
+
+def plot_before_after(df, prefix, title, ylabel, filename):
+    import matplotlib.pyplot as plt
 
     plt.figure(figsize=(10, 5))
-    plt.plot(df["id"], df["tokens_before"], marker="o", label="Before")
-    plt.plot(df["id"], df["tokens_after"], marker="o", label="After")
-    plt.title("Token Usage (Before vs After)")
+    plt.plot(df["id"], df[f"{prefix}_before"], marker="o", label="Before")
+    plt.plot(df["id"], df[f"{prefix}_after"], marker="o", label="After")
+    plt.title(title)
     plt.xlabel("Case ID")
-    plt.ylabel("Token Count")
+    plt.ylabel(ylabel)
     plt.legend()
     plt.grid()
-    plt.savefig("token_savings.png")
+    plt.savefig(filename)
+    plt.close()
 
-    # Coverage plot
+# MAIN TEST FUNCTION
 
-    plt.figure(figsize=(10,5))
-    plt.plot(df["id"], df["coverage_before"], marker="o", label="Before")
-    plt.plot(df["id"], df["coverage_after"], marker="o", label="After")
-    plt.title("Content Coverage (TF-IDF Features)")
-    plt.xlabel("Case ID")
-    plt.ylabel("TF-IDF Features")
-    plt.legend()
-    plt.grid()
-    plt.savefig("coverage.png")
+def run_tests(cases=None, metrics=None, batch_size=EMBED_BATCH_SIZE,
+              bert_batch_size=BERT_BATCH_SIZE, use_cache=True, workers=None,
+              output="evaluation_results_clean.csv", plots=True, backend="torch"):
+    """
+    Compute the metrics, write them to a CSV, plot and print ROI figures.
+
+    Args:
+        cases: Case dicts (see load_cases); None loads the Google Sheet
+        metrics: Metric names to compute; None computes all of them
+        use_cache: Reuse metric values and embeddings cached by earlier runs
+        workers: Processes for the CPU-only metrics (None = all cores)
+        output: CSV file to write
+        plots: Save the token and coverage plots (when those metrics ran)
+        backend: Inference backend for the model-based metrics (see BACKENDS)
+    """
+    if cases is None:
+        cases = load_cases(GOOGLE_SHEET_URL)
+
+    # Metric values are cached per input text, so only new or changed cases
+    # are computed; the CSV is always rewritten with every case
+    cache = MetricCache() if use_cache else None
+    store = EmbeddingStore(embedding_model_id(backend)) if use_cache else None
+    try:
+        print("Computing metrics...")
+        results = compute_metrics(cases, cache, batch_size, bert_batch_size, workers, metrics,
+                                  embedding_store=store, backend=backend)
+    finally:
+        if cache is not None:
+            cache.close()
+            store.close()
+
+    df = pd.DataFrame(results)
+    df.to_csv(output, index=False)
+    print(f"Saved {output}")
+
+    if plots and "tokens_before" in df:
+        plot_before_after(df, "tokens", "Token Usage (Before vs After)",
+                          "Token Count", "token_savings.png")
+    if plots and "coverage_before" in df:
+        plot_before_after(df, "coverage", "Content Coverage (TF-IDF Features)",
+                          "TF-IDF Features", "coverage.png")
 
     # ROI metrics
 
-    roi = compute_roi(df)
-    print("\n===== ROI METRICS =====")
-    print("Semantic quality score:", round(roi["semantic_quality_score"], 2), "%")
-    print("Iteration reduction:", round(roi["iteration_reduction"], 2), "%")
-    print("Token reduction:", round(roi["token_reduction"], 2), "%")
-    print("Average optimization time:", roi["avg_time"], "sec")
+    if set(ROI_COLUMNS).issubset(df.columns):
+        print_roi(compute_roi(df))
 
     return df
 
+def run_streaming(source, chunk_size=10_000, metrics=None, batch_size=EMBED_BATCH_SIZE,
+                  bert_batch_size=BERT_BATCH_SIZE, use_cache=True, workers=None,
+                  output="evaluation_results_clean.csv", backend="torch"):
+    """
+    Like run_tests, but for datasets too large to hold in memory.
+
+    Cases are read chunk_size rows at a time; each chunk's results are
+    appended to the CSV before the next chunk is read, so memory stays
+    bounded by the chunk size. ROI figures come from running sums. No plots
+    (they aren't readable with millions of cases).
+
+    Returns:
+        Number of cases evaluated
+    """
+    workers = workers or os.cpu_count() or 1
+    cache = MetricCache() if use_cache else None
+    store = EmbeddingStore(embedding_model_id(backend)) if use_cache else None
+    # One pool for the whole run instead of one per chunk
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    sums = dict.fromkeys(ROI_COLUMNS, 0.0)
+    total = 0
+    try:
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            for cases in iter_case_chunks(source, chunk_size):
+                results = compute_metrics(cases, cache, batch_size, bert_batch_size,
+                                          workers, metrics, pool=pool, verbose=False,
+                                          embedding_store=store, backend=backend)
+                df = pd.DataFrame(results)
+                df.to_csv(f, header=(total == 0), index=False)
+                f.flush()
+
+                total += len(df)
+                if set(ROI_COLUMNS).issubset(df.columns):
+                    for c in ROI_COLUMNS:
+                        sums[c] += float(df[c].sum())
+                print(f"  {total} cases evaluated")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if cache is not None:
+            cache.close()
+            store.close()
+
+    print(f"Saved {output}")
+    if total and (metrics is None or {"semantic_similarity", "tokens"}.issubset(metrics)):
+        print_roi(roi_from_means({c: sums[c] / total for c in ROI_COLUMNS}))
+    return total
+
+def parity_check(cases, backend, batch_size=EMBED_BATCH_SIZE, bert_batch_size=BERT_BATCH_SIZE):
+    """
+    Compare the model-based metrics of a backend against the PyTorch reference.
+
+    Both paths score the same cases (no caches involved); model loading is
+    kept out of the timings. Metrics the backend computes with the PyTorch
+    model anyway (bert_score under "onnx") are not compared.
+
+    Returns:
+        dict of metric -> max_abs_delta, mean_abs_delta, pearson,
+        torch_seconds, backend_seconds and speedup, or -> {"skipped": reason}
+    """
+    before = [c["before_output"] for c in cases]
+    after = [c["after_output"] for c in cases]
+    scorers = {
+        "semantic_similarity": (
+            lambda b: get_st_model(b),
+            lambda b: semantic_similarities(before, after, batch_size, backend=b)),
+        "bert_score": (
+            lambda b: get_bert_scorer(b),
+            lambda b: bert_scores(before, after, bert_batch_size, backend=b)),
+    }
+
+    report = {}
+    for name, (load, score) in scorers.items():
+        if metric_backend(name, backend) == "torch":
+            report[name] = {"skipped": f"no {backend} path, scored with the PyTorch model"}
+            continue
+        seconds, values = {}, {}
+        for b in ("torch", backend):
+            load(b)
+            started = time.perf_counter()
+            values[b] = np.asarray(score(b), dtype=np.float64)
+            seconds[b] = time.perf_counter() - started
+        delta = np.abs(values[backend] - values["torch"])
+        report[name] = {
+            "max_abs_delta": float(delta.max()) if len(delta) else 0.0,
+            "mean_abs_delta": float(delta.mean()) if len(delta) else 0.0,
+            "pearson": float(np.corrcoef(values["torch"], values[backend])[0, 1])
+                       if len(delta) > 1 else float("nan"),
+            "torch_seconds": seconds["torch"],
+            "backend_seconds": seconds[backend],
+            "speedup": seconds["torch"] / seconds[backend] if seconds[backend] else float("inf"),
+        }
+    return report
+
+def print_parity(report, backend, n_cases):
+    print(f"\n===== PARITY: {backend} vs torch ({n_cases} cases) =====")
+    for name, r in report.items():
+        if "skipped" in r:
+            print(f"{name}: {r['skipped']}")
+            continue
+        print(f"{name}: max |delta| {r['max_abs_delta']:.5f}, mean |delta| {r['mean_abs_delta']:.5f}, "
+              f"pearson {r['pearson']:.5f}, {r['torch_seconds']:.2f}s -> "
+              f"{r['backend_seconds']:.2f}s ({r['speedup']:.1f}x)")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate before/after prompt outputs")
+    parser.add_argument("source", nargs="?", default=GOOGLE_SHEET_URL,
+                        help="cases as .csv, .jsonl or .parquet (default: the Google Sheet)")
+    parser.add_argument("--metrics", default=",".join(METRIC_VERSIONS),
+                        help="comma-separated metrics to run (default: all of "
+                             + ", ".join(METRIC_VERSIONS) + ")")
+    parser.add_argument("--output", default="evaluation_results_clean.csv",
+                        help="CSV file for the results")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for the CPU-only metrics (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="texts per embedding batch")
+    parser.add_argument("--bert-batch-size", type=int, default=BERT_BATCH_SIZE,
+                        help="pairs per BERTScore batch")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="recompute every metric instead of reusing cached values")
+    parser.add_argument("--no-plots", action="store_true", help="skip the PNG plots")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="inference backend for the model-based metrics (default: torch)")
+    parser.add_argument("--parity", type=int, metavar="N", default=None,
+                        help="compare --backend against torch on the first N cases and exit")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="stream the cases this many rows at a time, appending results "
+                             "as they're computed (for datasets larger than memory; no plots)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics = [m.strip() for m in args.metrics.split(",") if m.strip()]
+    if _table_format(args.source) == "parquet":
+        # Fail before any model or worker is started
+        try:
+            get_parquet()
+        except ImportError as exc:
+            raise SystemExit(f"Error: {exc}")
+    if args.parity:
+        cases = next(iter_case_chunks(args.source, args.parity), [])
+        report = parity_check(cases, args.backend, args.batch_size, args.bert_batch_size)
+        print_parity(report, args.backend, len(cases))
+        return
+    if args.chunk_size:
+        run_streaming(
+            args.source,
+            chunk_size=args.chunk_size,
+            metrics=metrics,
+            batch_size=args.batch_size,
+            bert_batch_size=args.bert_batch_size,
+            use_cache=not args.no_cache,
+            workers=args.workers,
+            output=args.output,
+            backend=args.backend,
+        )
+        return
+    run_tests(
+        cases=load_cases(args.source),
+        metrics=metrics,
+        batch_size=args.batch_size,
+        bert_batch_size=args.bert_batch_size,
+        use_cache=not args.no_cache,
+        workers=args.workers,
+        output=args.output,
+        plots=not args.no_plots,
+        backend=args.backend,
+    )
+
 if __name__ == "__main__":
-    run_tests()
+    main()
@@ -0,0 +1,87 @@
+# Pure-CPU text metrics for the evaluation harness (tests2.py).
+# Kept apart from tests2 so worker processes can import them without loading
+# the models or the dataset. The libraries behind each metric are imported on
+# first use.
+
+import gzip
+import math
+from functools import lru_cache
+
+# NLTK resource path -> download name, fetched only if not installed yet
+NLTK_RESOURCES = {
+    "tokenizers/punkt": "punkt",
+    "taggers/averaged_perceptron_tagger": "averaged_perceptron_tagger",
+}
+
+@lru_cache(maxsize=None)
+def get_nltk():
+    import nltk
+    for path, name in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(name, quiet=True)
+    return nltk
+
+@lru_cache(maxsize=None)
+def get_rouge():
+    from rouge_score import rouge_scorer
+    return rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
+
+CONTENT_TAGS = {
+    "NN","NNS","NNP","NNPS",
+    "VB","VBD","VBG","VBN","VBP","VBZ",
+    "JJ","JJR","JJS",
+    "RB","RBR","RBS"
+}
+
+def rouge_single(a, b):
+    return get_rouge().score(a, b)["rougeL"].fmeasure
+
+def readability(text):
+    import textstat
+    return textstat.flesch_reading_ease(text)
+
+def info_density(text):
+    nltk = get_nltk()
+    tokens = nltk.word_tokenize(text)
+    tags = nltk.pos_tag(tokens)
+    if len(tokens) == 0:
+        return 0
+    cw = sum(1 for w, t in tags if t in CONTENT_TAGS)
+    return cw / len(tokens)
+
+def compression_rate(text):
+    raw = text.encode("utf-8")
+    comp = gzip.compress(raw)
+    return len(comp) / len(raw) if len(raw) > 0 else 0
+
+# Metric name -> function of one input tuple: (before, after) or (text,)
+CPU_METRICS = {
+    "rouge": rouge_single,
+    "readability": readability,
+    "info_density": info_density,
+    "compression": compression_rate,
+}
+
+def compute_chunk(name, inputs):
+    # Runs in a worker process; returns one value per input tuple, in order
+    fn = CPU_METRICS[name]
+    return [fn(*inp) for inp in inputs]
+
+def submit_chunks(pool, name, inputs, workers):
+    """
+    Split a metric's inputs into chunks and queue them on a process pool.
+
+    A few chunks per worker keeps every core busy without paying the
+    pickling overhead of one task per text.
+
+    Returns:
+        list of futures, in input order; concatenating their results gives
+        the same values a serial compute_chunk(name, inputs) would.
+    """
+    chunk_size = max(1, min(256, math.ceil(len(inputs) / (workers * 4))))
+    return [
+        pool.submit(compute_chunk, name, inputs[i:i + chunk_size])
+        for i in range(0, len(inputs), chunk_size)
+    ]
@@ -0,0 +1,39 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Encoding used by the gpt-oss / gpt-4o family of models
+DEFAULT_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoder(encoding_name: str = DEFAULT_ENCODING):
+    """
+    Load a tiktoken encoder once per process.
+
+    Returns:
+        The encoder, or None if tiktoken is missing or the encoding
+        can't be loaded (e.g. offline on first use).
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, encoding_name: str = DEFAULT_ENCODING) -> int:
+    """
+    Count tokens locally.
+
+    Falls back to the usual ~4 characters per token estimate when no
+    tokenizer is available.
+    """
+    encoder = get_encoder(encoding_name)
+    if encoder is None:
+        return (len(text) + 3) // 4
+    return len(encoder.encode(text, disallowed_special=()))
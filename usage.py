@@ -0,0 +1,132 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+from tokens import count_tokens
+
+
+class UsageTracker:
+    """
+    Collects one record per model call and aggregates them.
+
+    A record is a dict with: purpose, model, prompt_tokens, completion_tokens,
+    total_tokens, wall_time (seconds), estimated (True when the token counts
+    came from the local tokenizer instead of the API), cached (True when the
+    response came from the response cache and used no API quota).
+    """
+
+    def __init__(self):
+        self.records: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, entry: Dict) -> None:
+        with self._lock:
+            self.records.append(entry)
+
+    def totals(self, purpose: Optional[str] = None) -> Dict:
+        """
+        Sum the recorded calls
+
+        Args:
+            purpose: Only count calls with this purpose ("clarify", "optimize", ...)
+
+        Returns:
+            dict with calls, cached_calls, prompt/completion/total tokens and wall_time
+        """
+        with self._lock:
+            records = [r for r in self.records if purpose is None or r.get("purpose") == purpose]
+        return _sum(records)
+
+    def by_purpose(self) -> Dict[str, Dict]:
+        """Totals grouped by call purpose, in first-seen order"""
+        return self._grouped(lambda r: r.get("purpose") or "other")
+
+    def by_model(self) -> Dict[str, Dict]:
+        """Totals grouped by model name"""
+        return self._grouped(lambda r: r.get("model") or "unknown")
+
+    def _grouped(self, key) -> Dict[str, Dict]:
+        groups: Dict[str, List[Dict]] = {}
+        with self._lock:
+            for r in self.records:
+                groups.setdefault(key(r), []).append(r)
+        return {k: _sum(records) for k, records in groups.items()}
+
+    def summary(self) -> str:
+        """One line per purpose plus a total, for printing"""
+        lines = []
+        for purpose, t in self.by_purpose().items():
+            lines.append(_format_line(purpose, t))
+        lines.append(_format_line("total", self.totals()))
+        return "\n".join(lines)
+
+
+def _sum(records: List[Dict]) -> Dict:
+    return {
+        "calls": len(records),
+        "cached_calls": sum(1 for r in records if r.get("cached")),
+        "prompt_tokens": sum(r["prompt_tokens"] for r in records),
+        "completion_tokens": sum(r["completion_tokens"] for r in records),
+        "total_tokens": sum(r["total_tokens"] for r in records),
+        "wall_time": sum(r["wall_time"] for r in records),
+    }
+
+
+def _format_line(label: str, t: Dict) -> str:
+    cached = f", {t['cached_calls']} cached" if t["cached_calls"] else ""
+    return (
+        f"{label}: {t['calls']} call(s){cached}, "
+        f"{t['prompt_tokens']} prompt + {t['completion_tokens']} completion "
+        f"= {t['total_tokens']} tokens, {t['wall_time']:.2f}s"
+    )
+
+
+# Every connector in this process also reports here
+PROCESS_USAGE = UsageTracker()
+
+
+def chunk_usage(chunk, current=None):
+    """
+    API usage carried by a streamed chunk, else `current`. Groq reports it
+    on the final chunk, under x_groq.
+    """
+    x_groq = getattr(chunk, "x_groq", None)
+    return getattr(chunk, "usage", None) or getattr(x_groq, "usage", None) or current
+
+
+def build_record(model: str, prompt: str, content: str, api_usage, started: float,
+                 purpose: Optional[str] = None, cached: bool = False) -> Dict:
+    """
+    Turn one model call into a usage record
+
+    Args:
+        model: Model name
+        prompt: Text sent to the model (for the tokenizer fallback)
+        content: Text the model returned (for the tokenizer fallback)
+        api_usage: The response's `usage` object, or None if the API didn't send one
+        started: time.perf_counter() value taken before the call
+        purpose: Label such as "clarify" or "optimize"
+        cached: Whether the response came from the response cache
+    """
+    if cached:
+        prompt_tokens = completion_tokens = 0
+        estimated = False
+    elif api_usage is not None:
+        prompt_tokens = api_usage.prompt_tokens or 0
+        completion_tokens = api_usage.completion_tokens or 0
+        estimated = False
+    else:
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(content)
+        estimated = True
+
+    return {
+        "purpose": purpose,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "wall_time": time.perf_counter() - started,
+        "estimated": estimated,
+        "cached": cached,
+    }